@@ -1,12 +1,16 @@
-import requests
+from xhs_utils.session_util import SessionPool
 from xhs_utils.cookie_util import trans_cookies
 from xhs_utils.xhs_creator_util import get_common_headers, generate_xs, splice_str
 from xhs_utils.xhs_util import generate_x_b3_traceid
 
 
 class XHS_Creator_Apis():
-    def __init__(self):
+    def __init__(self, session_pool: SessionPool = None):
         self.base_url = "https://edith.xiaohongshu.com"
+        self.session_pool = session_pool or SessionPool()
+
+    def pool_stats(self):
+        return self.session_pool.stats()
 
 
     # page: 页数
@@ -28,7 +32,7 @@ class XHS_Creator_Apis():
             cookies = trans_cookies(cookies_str)
             xs, xt, _ = generate_xs(cookies['a1'], splice_api, '')
             headers['x-s'], headers['x-t'] = xs, str(xt)
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, verify=False)
+            response = self.session_pool.get(cookies_str).get(self.base_url + splice_api, headers=headers, cookies=cookies, verify=False)
             res_json = response.json()
             success = res_json["success"]
         except Exception as e:
@@ -3,7 +3,12 @@ import json
 import re
 import urllib
 import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from xhs_utils.xhs_util import splice_str, generate_request_params, generate_x_b3_traceid, get_common_headers
+from xhs_utils.session_util import SessionPool
+from xhs_utils.checkpoint_util import CheckpointStore
+from xhs_utils.cache_util import ResponseCache
 from loguru import logger
 
 """
@@ -11,8 +16,120 @@ from loguru import logger
     :param cookies_str: 你的cookies
 """
 class XHS_Apis():
-    def __init__(self):
+    def __init__(self, session_pool: SessionPool = None, checkpoint_store: CheckpointStore = None, response_cache: ResponseCache = None):
+        """
+            :param session_pool: 复用连接的session池
+            :param checkpoint_store: 分页进度存储，传入后 iter_* 翻页中断时下次会从断点继续
+            :param response_cache: 接口结果缓存，传入后 response_cache.ttls 中的接口相同参数的请求在有效期内直接返回缓存
+        """
         self.base_url = "https://edith.xiaohongshu.com"
+        self.session_pool = session_pool or SessionPool()
+        self.checkpoint_store = checkpoint_store
+        self.response_cache = response_cache
+        if response_cache is not None:
+            for endpoint in response_cache.ttls:
+                setattr(self, endpoint, response_cache.wrap(endpoint, getattr(self, endpoint)))
+
+    def get_session(self, cookies_str: str, proxies: dict = None):
+        """
+            获取cookies和代理对应的复用连接的session
+        """
+        return self.session_pool.get(cookies_str, proxies)
+
+    def pool_stats(self):
+        """
+            返回连接池的统计信息
+        """
+        return self.session_pool.stats()
+
+    def cache_stats(self):
+        """
+            返回接口缓存的命中统计，未开启缓存时返回None
+        """
+        if self.response_cache is None:
+            return None
+        return self.response_cache.stats()
+
+    def load_checkpoint(self, endpoint: str, entity_id: str, resume: bool = True):
+        """
+            读取翻页断点，未开启、resume 为False或没有断点时返回None
+        """
+        if self.checkpoint_store is None or not resume:
+            return None
+        return self.checkpoint_store.get(endpoint, entity_id)
+
+    def save_checkpoint(self, endpoint: str, entity_id: str, cursor, has_more: bool, count: int = 0, resume: bool = True):
+        """
+            记录已消费完的页，翻页结束时删除断点，resume 为False时不记录
+        """
+        if self.checkpoint_store is None or not resume:
+            return
+        if has_more:
+            self.checkpoint_store.save(endpoint, entity_id, cursor, has_more, count)
+        else:
+            self.checkpoint_store.clear(endpoint, entity_id)
+
+    @staticmethod
+    def iter_cursor_pages(fetch, cursor: str = '', prefetch: int = 0):
+        """
+            按cursor翻页，yield 每页的 (success, msg, res_json)
+            :param fetch: fetch(cursor) 请求一页
+            :param prefetch: 大于0时收到一页后立即在后台请求下一页，与调用方处理当前页重叠
+            调用方停止迭代即结束翻页
+        """
+        if prefetch <= 0:
+            while True:
+                success, msg, res_json = fetch(cursor)
+                yield success, msg, res_json
+                cursor = str(res_json["data"]["cursor"])
+        executor = ThreadPoolExecutor(1)
+        future = executor.submit(fetch, cursor)
+        try:
+            while True:
+                success, msg, res_json = future.result()
+                future = None
+                data = res_json["data"] if success else {}
+                if 'cursor' in data and data.get('has_more'):
+                    future = executor.submit(fetch, str(data["cursor"]))
+                yield success, msg, res_json
+                if future is None:
+                    # 没有下一页，调用方本应已经停止
+                    return
+        finally:
+            if future is not None:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    @staticmethod
+    def iter_number_pages(fetch, page: int = 1, prefetch: int = 0, last_page: int = None):
+        """
+            按页码翻页，yield 每页的 (success, msg, res_json)
+            :param fetch: fetch(page) 请求一页
+            :param prefetch: 大于0时同时预先请求后面 prefetch 页
+            :param last_page: 预取不超过这一页，之后仍按需逐页请求
+            调用方停止迭代即结束翻页
+        """
+        if prefetch <= 0:
+            while True:
+                yield fetch(page)
+                page += 1
+        executor = ThreadPoolExecutor(prefetch)
+        futures = deque()
+        next_page = page
+        try:
+            while True:
+                while len(futures) < prefetch and (last_page is None or next_page <= last_page):
+                    futures.append(executor.submit(fetch, next_page))
+                    next_page += 1
+                if not futures:
+                    # 已超出预计的页数（有的页不满），只请求当前需要的一页
+                    futures.append(executor.submit(fetch, next_page))
+                    next_page += 1
+                yield futures.popleft().result()
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
 
     def get_homefeed_all_channel(self, cookies_str: str, proxies: dict = None):
         """
@@ -23,7 +140,7 @@ class XHS_Apis():
         try:
             api = "/api/sns/web/v1/homefeed/category"
             headers, cookies, data = generate_request_params(cookies_str, api, '', 'GET')
-            response = requests.get(self.base_url + api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self.get_session(cookies_str, proxies).get(self.base_url + api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -63,7 +180,7 @@ class XHS_Apis():
                 "need_filter_image": False
             }
             headers, cookies, trans_data = generate_request_params(cookies_str, api, data, 'POST')
-            response = requests.post(self.base_url + api, headers=headers, data=trans_data, cookies=cookies, proxies=proxies)
+            response = self.get_session(cookies_str, proxies).post(self.base_url + api, headers=headers, data=trans_data, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -117,7 +234,7 @@ class XHS_Apis():
             }
             splice_api = splice_str(api, params)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self.get_session(cookies_str, proxies).get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -135,7 +252,7 @@ class XHS_Apis():
         try:
             api = f"/api/sns/web/v1/user/selfinfo"
             headers, cookies, data = generate_request_params(cookies_str, api, '', 'GET')
-            response = requests.get(self.base_url + api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self.get_session(cookies_str, proxies).get(self.base_url + api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -154,7 +271,7 @@ class XHS_Apis():
         try:
             api = f"/api/sns/web/v2/user/me"
             headers, cookies, data = generate_request_params(cookies_str, api, '', 'GET')
-            response = requests.get(self.base_url + api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self.get_session(cookies_str, proxies).get(self.base_url + api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -183,7 +300,7 @@ class XHS_Apis():
             }
             splice_api = splice_str(api, params)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self.get_session(cookies_str, proxies).get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -192,34 +309,55 @@ class XHS_Apis():
         return success, msg, res_json
 
 
-    def get_user_all_notes(self, user_url: str, cookies_str: str, proxies: dict = None):
+    def iter_user_all_notes(self, user_url: str, cookies_str: str, proxies: dict = None, prefetch: int = 0, resume: bool = True):
         """
-           获取用户所有笔记
-           :param user_id: 你想要获取的用户的id
-           :param cookies_str: 你的cookies
-           返回用户的所有笔记
+            逐页获取用户所有笔记
+            :param user_url: 你想要获取的用户的主页url
+            :param cookies_str: 你的cookies
+            每获取一页就 yield 该页的每条笔记，获取失败时抛出异常
+            开启断点时从上次中断的页继续
+            :param prefetch: 大于0时处理当前页的同时请求下一页
+            :param resume: 为False时不读取也不记录断点，调用方把结果全部收集后才使用时传False
         """
+        endpoint = 'user_all_notes'
         cursor = ''
+        urlParse = urllib.parse.urlparse(user_url)
+        user_id = urlParse.path.split("/")[-1]
+        kvs = urlParse.query.split('&')
+        kvDist = {kv.split('=')[0]: kv.split('=')[1] for kv in kvs}
+        xsec_token = kvDist['xsec_token'] if 'xsec_token' in kvDist else ""
+        xsec_source = kvDist['xsec_source'] if 'xsec_source' in kvDist else "pc_search"
+        checkpoint = self.load_checkpoint(endpoint, user_id, resume=resume)
+        if checkpoint:
+            cursor = checkpoint['cursor']
+        pages = self.iter_cursor_pages(lambda cursor: self.get_user_note_info(user_id, cursor, cookies_str, xsec_token, xsec_source, proxies), cursor, prefetch)
+        for success, msg, res_json in pages:
+            if not success:
+                raise Exception(msg)
+            notes = res_json["data"]["notes"]
+            if 'cursor' in res_json["data"]:
+                cursor = str(res_json["data"]["cursor"])
+            else:
+                self.save_checkpoint(endpoint, user_id, cursor, False, resume=resume)
+                break
+            yield from notes
+            has_more = len(notes) > 0 and res_json["data"]["has_more"]
+            self.save_checkpoint(endpoint, user_id, cursor, has_more, resume=resume)
+            if not has_more:
+                break
+
+    def get_user_all_notes(self, user_url: str, cookies_str: str, proxies: dict = None):
+        """
+            获取用户所有笔记
+            :param user_url: 你想要获取的用户的主页url
+            :param cookies_str: 你的cookies
+            返回用户的所有笔记
+        """
         note_list = []
         try:
-            urlParse = urllib.parse.urlparse(user_url)
-            user_id = urlParse.path.split("/")[-1]
-            kvs = urlParse.query.split('&')
-            kvDist = {kv.split('=')[0]: kv.split('=')[1] for kv in kvs}
-            xsec_token = kvDist['xsec_token'] if 'xsec_token' in kvDist else ""
-            xsec_source = kvDist['xsec_source'] if 'xsec_source' in kvDist else "pc_search"
-            while True:
-                success, msg, res_json = self.get_user_note_info(user_id, cursor, cookies_str, xsec_token, xsec_source, proxies)
-                if not success:
-                    raise Exception(msg)
-                notes = res_json["data"]["notes"]
-                if 'cursor' in res_json["data"]:
-                    cursor = str(res_json["data"]["cursor"])
-                else:
-                    break
-                note_list.extend(notes)
-                if len(notes) == 0 or not res_json["data"]["has_more"]:
-                    break
+            for note in self.iter_user_all_notes(user_url, cookies_str, proxies, resume=False):
+                note_list.append(note)
+            success, msg = True, 'success'
         except Exception as e:
             success = False
             msg = str(e)
@@ -246,7 +384,7 @@ class XHS_Apis():
             }
             splice_api = splice_str(api, params)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self.get_session(cookies_str, proxies).get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -254,35 +392,55 @@ class XHS_Apis():
             msg = str(e)
         return success, msg, res_json
 
+    def iter_user_all_like_note_info(self, user_url: str, cookies_str: str, proxies: dict = None, prefetch: int = 0, resume: bool = True):
+        """
+            逐页获取用户所有喜欢笔记
+            :param user_url: 你想要获取的用户的主页url
+            :param cookies_str: 你的cookies
+            每获取一页就 yield 该页的每条笔记，获取失败时抛出异常
+            开启断点时从上次中断的页继续
+            :param prefetch: 大于0时处理当前页的同时请求下一页
+            :param resume: 为False时不读取也不记录断点，调用方把结果全部收集后才使用时传False
+        """
+        endpoint = 'user_all_like_note_info'
+        cursor = ''
+        urlParse = urllib.parse.urlparse(user_url)
+        user_id = urlParse.path.split("/")[-1]
+        kvs = urlParse.query.split('&')
+        kvDist = {kv.split('=')[0]: kv.split('=')[1] for kv in kvs}
+        xsec_token = kvDist['xsec_token'] if 'xsec_token' in kvDist else ""
+        xsec_source = kvDist['xsec_source'] if 'xsec_source' in kvDist else "pc_user"
+        checkpoint = self.load_checkpoint(endpoint, user_id, resume=resume)
+        if checkpoint:
+            cursor = checkpoint['cursor']
+        pages = self.iter_cursor_pages(lambda cursor: self.get_user_like_note_info(user_id, cursor, cookies_str, xsec_token, xsec_source, proxies), cursor, prefetch)
+        for success, msg, res_json in pages:
+            if not success:
+                raise Exception(msg)
+            notes = res_json["data"]["notes"]
+            if 'cursor' in res_json["data"]:
+                cursor = str(res_json["data"]["cursor"])
+            else:
+                self.save_checkpoint(endpoint, user_id, cursor, False, resume=resume)
+                break
+            yield from notes
+            has_more = len(notes) > 0 and res_json["data"]["has_more"]
+            self.save_checkpoint(endpoint, user_id, cursor, has_more, resume=resume)
+            if not has_more:
+                break
+
     def get_user_all_like_note_info(self, user_url: str, cookies_str: str, proxies: dict = None):
         """
             获取用户所有喜欢笔记
-            :param user_id: 你想要获取的用户的id
+            :param user_url: 你想要获取的用户的主页url
             :param cookies_str: 你的cookies
             返回用户的所有喜欢笔记
         """
-        cursor = ''
         note_list = []
         try:
-            urlParse = urllib.parse.urlparse(user_url)
-            user_id = urlParse.path.split("/")[-1]
-            kvs = urlParse.query.split('&')
-            kvDist = {kv.split('=')[0]: kv.split('=')[1] for kv in kvs}
-            xsec_token = kvDist['xsec_token'] if 'xsec_token' in kvDist else ""
-            xsec_source = kvDist['xsec_source'] if 'xsec_source' in kvDist else "pc_user"
-            while True:
-                success, msg, res_json = self.get_user_like_note_info(user_id, cursor, cookies_str, xsec_token,
-                                                                      xsec_source, proxies)
-                if not success:
-                    raise Exception(msg)
-                notes = res_json["data"]["notes"]
-                if 'cursor' in res_json["data"]:
-                    cursor = str(res_json["data"]["cursor"])
-                else:
-                    break
-                note_list.extend(notes)
-                if len(notes) == 0 or not res_json["data"]["has_more"]:
-                    break
+            for note in self.iter_user_all_like_note_info(user_url, cookies_str, proxies, resume=False):
+                note_list.append(note)
+            success, msg = True, 'success'
         except Exception as e:
             success = False
             msg = str(e)
@@ -309,7 +467,7 @@ class XHS_Apis():
             }
             splice_api = splice_str(api, params)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self.get_session(cookies_str, proxies).get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -317,35 +475,55 @@ class XHS_Apis():
             msg = str(e)
         return success, msg, res_json
 
+    def iter_user_all_collect_note_info(self, user_url: str, cookies_str: str, proxies: dict = None, prefetch: int = 0, resume: bool = True):
+        """
+            逐页获取用户所有收藏笔记
+            :param user_url: 你想要获取的用户的主页url
+            :param cookies_str: 你的cookies
+            每获取一页就 yield 该页的每条笔记，获取失败时抛出异常
+            开启断点时从上次中断的页继续
+            :param prefetch: 大于0时处理当前页的同时请求下一页
+            :param resume: 为False时不读取也不记录断点，调用方把结果全部收集后才使用时传False
+        """
+        endpoint = 'user_all_collect_note_info'
+        cursor = ''
+        urlParse = urllib.parse.urlparse(user_url)
+        user_id = urlParse.path.split("/")[-1]
+        kvs = urlParse.query.split('&')
+        kvDist = {kv.split('=')[0]: kv.split('=')[1] for kv in kvs}
+        xsec_token = kvDist['xsec_token'] if 'xsec_token' in kvDist else ""
+        xsec_source = kvDist['xsec_source'] if 'xsec_source' in kvDist else "pc_search"
+        checkpoint = self.load_checkpoint(endpoint, user_id, resume=resume)
+        if checkpoint:
+            cursor = checkpoint['cursor']
+        pages = self.iter_cursor_pages(lambda cursor: self.get_user_collect_note_info(user_id, cursor, cookies_str, xsec_token, xsec_source, proxies), cursor, prefetch)
+        for success, msg, res_json in pages:
+            if not success:
+                raise Exception(msg)
+            notes = res_json["data"]["notes"]
+            if 'cursor' in res_json["data"]:
+                cursor = str(res_json["data"]["cursor"])
+            else:
+                self.save_checkpoint(endpoint, user_id, cursor, False, resume=resume)
+                break
+            yield from notes
+            has_more = len(notes) > 0 and res_json["data"]["has_more"]
+            self.save_checkpoint(endpoint, user_id, cursor, has_more, resume=resume)
+            if not has_more:
+                break
+
     def get_user_all_collect_note_info(self, user_url: str, cookies_str: str, proxies: dict = None):
         """
             获取用户所有收藏笔记
-            :param user_id: 你想要获取的用户的id
+            :param user_url: 你想要获取的用户的主页url
             :param cookies_str: 你的cookies
             返回用户的所有收藏笔记
         """
-        cursor = ''
         note_list = []
         try:
-            urlParse = urllib.parse.urlparse(user_url)
-            user_id = urlParse.path.split("/")[-1]
-            kvs = urlParse.query.split('&')
-            kvDist = {kv.split('=')[0]: kv.split('=')[1] for kv in kvs}
-            xsec_token = kvDist['xsec_token'] if 'xsec_token' in kvDist else ""
-            xsec_source = kvDist['xsec_source'] if 'xsec_source' in kvDist else "pc_search"
-            while True:
-                success, msg, res_json = self.get_user_collect_note_info(user_id, cursor, cookies_str, xsec_token,
-                                                                         xsec_source, proxies)
-                if not success:
-                    raise Exception(msg)
-                notes = res_json["data"]["notes"]
-                if 'cursor' in res_json["data"]:
-                    cursor = str(res_json["data"]["cursor"])
-                else:
-                    break
-                note_list.extend(notes)
-                if len(notes) == 0 or not res_json["data"]["has_more"]:
-                    break
+            for note in self.iter_user_all_collect_note_info(user_url, cookies_str, proxies, resume=False):
+                note_list.append(note)
+            success, msg = True, 'success'
         except Exception as e:
             success = False
             msg = str(e)
@@ -380,7 +558,7 @@ class XHS_Apis():
                 "xsec_token": kvDist['xsec_token']
             }
             headers, cookies, data = generate_request_params(cookies_str, api, data, 'POST')
-            response = requests.post(self.base_url + api, headers=headers, data=data, cookies=cookies, proxies=proxies)
+            response = self.get_session(cookies_str, proxies).post(self.base_url + api, headers=headers, data=data, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -404,7 +582,7 @@ class XHS_Apis():
             }
             splice_api = splice_str(api, params)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self.get_session(cookies_str, proxies).get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -511,7 +689,7 @@ class XHS_Apis():
                 ]
             }
             headers, cookies, data = generate_request_params(cookies_str, api, data, 'POST')
-            response = requests.post(self.base_url + api, headers=headers, data=data.encode('utf-8'), cookies=cookies, proxies=proxies)
+            response = self.get_session(cookies_str, proxies).post(self.base_url + api, headers=headers, data=data.encode('utf-8'), cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -519,7 +697,49 @@ class XHS_Apis():
             msg = str(e)
         return success, msg, res_json
 
-    def search_some_note(self, query: str, require_num: int, cookies_str: str, sort_type_choice=0, note_type=0, note_time=0, note_range=0, pos_distance=0, geo="", proxies: dict = None):
+    def iter_search_some_note(self, query: str, require_num: int, cookies_str: str, sort_type_choice=0, note_type=0, note_time=0, note_range=0, pos_distance=0, geo="", proxies: dict = None, prefetch: int = 0, resume: bool = True, by_page: bool = False):
+        """
+            逐页搜索笔记，参数同 search_some_note
+            每获取一页就 yield 该页的每条结果，最多 require_num 条，获取失败时抛出异常
+            开启断点时从上次中断的页继续，某页的断点在调用方取下一条（by_page 时为下一页）时才记录，调用方应处理完再继续取
+            :param by_page: 为True时每页 yield 一次该页结果的列表
+            :param prefetch: 大于0时同时预先请求后面 prefetch 页，遇到没有更多结果时停止
+            :param resume: 为False时不读取也不记录断点，调用方把结果全部收集后才使用时传False
+        """
+        endpoint = 'search_some_note'
+        entity_id = json.dumps([query, sort_type_choice, note_type, note_time, note_range, pos_distance, geo], ensure_ascii=False)
+        page = 1
+        count = 0
+        checkpoint = self.load_checkpoint(endpoint, entity_id, resume=resume)
+        if checkpoint:
+            page, count = checkpoint['cursor'], checkpoint['count']
+        # 每页最多 20 条，预取不超过凑满 require_num 所需的页数
+        last_page = page + (require_num - count + 19) // 20 - 1
+        pages = self.iter_number_pages(lambda page: self.search_note(query, cookies_str, page, sort_type_choice, note_type, note_time, note_range, pos_distance, geo, proxies), page, prefetch, last_page)
+        try:
+            # 先检查数量再请求下一页，凑满 require_num 后不再多请求
+            while count < require_num:
+                success, msg, res_json = next(pages)
+                if not success:
+                    raise Exception(msg)
+                if "items" not in res_json["data"]:
+                    self.save_checkpoint(endpoint, entity_id, page, False, resume=resume)
+                    break
+                notes = res_json["data"]["items"][:require_num - count]
+                count += len(notes)
+                if by_page:
+                    yield notes
+                else:
+                    yield from notes
+                page += 1
+                has_more = count < require_num and res_json["data"]["has_more"]
+                self.save_checkpoint(endpoint, entity_id, page, has_more, count, resume=resume)
+                if not has_more:
+                    break
+        finally:
+            pages.close()
+
+    def search_some_note(self, query: str, require_num: int, cookies_str: str, sort_type_choice=0, note_type=0, note_time=0, note_range=0, pos_distance=0, geo="", proxies: dict = None, prefetch: int = 0):
         """
             指定数量搜索笔记，设置排序方式和笔记类型和笔记数量
             :param query 搜索的关键词
@@ -531,27 +751,17 @@ class XHS_Apis():
             :param note_range 笔记范围 0 不限, 1 已看过, 2 未看过, 3 已关注
             :param pos_distance 位置距离 0 不限, 1 同城, 2 附近 指定这个必须要指定 geo
             :param geo: 定位信息 经纬度
+            :param prefetch: 同时预先请求的页数，0为逐页请求
             返回搜索的结果
         """
-        page = 1
         note_list = []
         try:
-            while True:
-                success, msg, res_json = self.search_note(query, cookies_str, page, sort_type_choice, note_type, note_time, note_range, pos_distance, geo, proxies)
-                if not success:
-                    raise Exception(msg)
-                if "items" not in res_json["data"]:
-                    break
-                notes = res_json["data"]["items"]
-                note_list.extend(notes)
-                page += 1
-                if len(note_list) >= require_num or not res_json["data"]["has_more"]:
-                    break
+            for note in self.iter_search_some_note(query, require_num, cookies_str, sort_type_choice, note_type, note_time, note_range, pos_distance, geo, proxies, prefetch, resume=False):
+                note_list.append(note)
+            success, msg = True, 'success'
         except Exception as e:
             success = False
             msg = str(e)
-        if len(note_list) > require_num:
-            note_list = note_list[:require_num]
         return success, msg, note_list
 
     def search_user(self, query: str, cookies_str: str, page=1, proxies: dict = None):
@@ -576,7 +786,7 @@ class XHS_Apis():
                 }
             }
             headers, cookies, data = generate_request_params(cookies_str, api, data, 'POST')
-            response = requests.post(self.base_url + api, headers=headers, data=data.encode('utf-8'), cookies=cookies, proxies=proxies)
+            response = self.get_session(cookies_str, proxies).post(self.base_url + api, headers=headers, data=data.encode('utf-8'), cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -584,33 +794,61 @@ class XHS_Apis():
             msg = str(e)
         return success, msg, res_json
 
-    def search_some_user(self, query: str, require_num: int, cookies_str: str, proxies: dict = None):
+    def iter_search_some_user(self, query: str, require_num: int, cookies_str: str, proxies: dict = None, prefetch: int = 0, resume: bool = True):
         """
-            指定数量搜索用户
-            :param query 搜索的关键词
-            :param require_num 搜索的数量
-            :param cookies_str 你的cookies
-            返回搜索的结果
+            逐页搜索用户，参数同 search_some_user
+            每获取一页就 yield 该页的每个用户，最多 require_num 个，获取失败时抛出异常
+            开启断点时从上次中断的页继续
+            :param prefetch: 大于0时同时预先请求后面 prefetch 页，遇到没有更多结果时停止
+            :param resume: 为False时不读取也不记录断点，调用方把结果全部收集后才使用时传False
         """
+        endpoint = 'search_some_user'
+        entity_id = query
         page = 1
-        user_list = []
+        count = 0
+        checkpoint = self.load_checkpoint(endpoint, entity_id, resume=resume)
+        if checkpoint:
+            page, count = checkpoint['cursor'], checkpoint['count']
+        # 每页最多 15 条，预取不超过凑满 require_num 所需的页数
+        last_page = page + (require_num - count + 14) // 15 - 1
+        pages = self.iter_number_pages(lambda page: self.search_user(query, cookies_str, page, proxies), page, prefetch, last_page)
         try:
-            while True:
-                success, msg, res_json = self.search_user(query, cookies_str, page, proxies)
+            # 先检查数量再请求下一页，凑满 require_num 后不再多请求
+            while count < require_num:
+                success, msg, res_json = next(pages)
                 if not success:
                     raise Exception(msg)
                 if "users" not in res_json["data"]:
+                    self.save_checkpoint(endpoint, entity_id, page, False, resume=resume)
                     break
-                users = res_json["data"]["users"]
-                user_list.extend(users)
+                users = res_json["data"]["users"][:require_num - count]
+                count += len(users)
+                yield from users
                 page += 1
-                if len(user_list) >= require_num or not res_json["data"]["has_more"]:
+                has_more = count < require_num and res_json["data"]["has_more"]
+                self.save_checkpoint(endpoint, entity_id, page, has_more, count, resume=resume)
+                if not has_more:
                     break
+        finally:
+            pages.close()
+
+    def search_some_user(self, query: str, require_num: int, cookies_str: str, proxies: dict = None, prefetch: int = 0):
+        """
+            指定数量搜索用户
+            :param query 搜索的关键词
+            :param require_num 搜索的数量
+            :param cookies_str 你的cookies
+            :param prefetch: 同时预先请求的页数，0为逐页请求
+            返回搜索的结果
+        """
+        user_list = []
+        try:
+            for user in self.iter_search_some_user(query, require_num, cookies_str, proxies, prefetch, resume=False):
+                user_list.append(user)
+            success, msg = True, 'success'
         except Exception as e:
             success = False
             msg = str(e)
-        if len(user_list) > require_num:
-            user_list = user_list[:require_num]
         return success, msg, user_list
 
     def get_note_out_comment(self, note_id: str, cursor: str, xsec_token: str, cookies_str: str, proxies: dict = None):
@@ -633,7 +871,7 @@ class XHS_Apis():
             }
             splice_api = splice_str(api, params)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self.get_session(cookies_str, proxies).get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -641,6 +879,39 @@ class XHS_Apis():
             msg = str(e)
         return success, msg, res_json
 
+    def iter_note_all_out_comment(self, note_id: str, xsec_token: str, cookies_str: str, proxies: dict = None, prefetch: int = 0, resume: bool = True):
+        """
+            逐页获取笔记的全部一级评论
+            :param note_id 笔记的id
+            :param cookies_str 你的cookies
+            每获取一页就 yield 该页的每条一级评论，获取失败时抛出异常
+            开启断点时从上次中断的页继续
+            :param prefetch: 大于0时处理当前页的同时请求下一页
+            :param resume: 为False时不读取也不记录断点，调用方把结果全部收集后才使用时传False
+        """
+        endpoint = 'note_all_out_comment'
+        cursor = ''
+        count = 0
+        checkpoint = self.load_checkpoint(endpoint, note_id, resume=resume)
+        if checkpoint:
+            cursor, count = checkpoint['cursor'], checkpoint['count']
+        pages = self.iter_cursor_pages(lambda cursor: self.get_note_out_comment(note_id, cursor, xsec_token, cookies_str, proxies), cursor, prefetch)
+        for success, msg, res_json in pages:
+            if not success:
+                raise Exception(msg)
+            comments = res_json["data"]["comments"]
+            if 'cursor' in res_json["data"]:
+                cursor = str(res_json["data"]["cursor"])
+            else:
+                self.save_checkpoint(endpoint, note_id, cursor, False, resume=resume)
+                break
+            count += len(comments)
+            yield from comments
+            has_more = count > 0 and res_json["data"]["has_more"]
+            self.save_checkpoint(endpoint, note_id, cursor, has_more, count, resume=resume)
+            if not has_more:
+                break
+
     def get_note_all_out_comment(self, note_id: str, xsec_token: str, cookies_str: str, proxies: dict = None):
         """
             获取笔记的全部一级评论
@@ -648,21 +919,11 @@ class XHS_Apis():
             :param cookies_str 你的cookies
             返回笔记的全部一级评论
         """
-        cursor = ''
         note_out_comment_list = []
         try:
-            while True:
-                success, msg, res_json = self.get_note_out_comment(note_id, cursor, xsec_token, cookies_str, proxies)
-                if not success:
-                    raise Exception(msg)
-                comments = res_json["data"]["comments"]
-                if 'cursor' in res_json["data"]:
-                    cursor = str(res_json["data"]["cursor"])
-                else:
-                    break
-                note_out_comment_list.extend(comments)
-                if len(note_out_comment_list) == 0 or not res_json["data"]["has_more"]:
-                    break
+            for comment in self.iter_note_all_out_comment(note_id, xsec_token, cookies_str, proxies, resume=False):
+                note_out_comment_list.append(comment)
+            success, msg = True, 'success'
         except Exception as e:
             success = False
             msg = str(e)
@@ -690,7 +951,7 @@ class XHS_Apis():
             }
             splice_api = splice_str(api, params)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self.get_session(cookies_str, proxies).get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -728,12 +989,52 @@ class XHS_Apis():
             msg = str(e)
         return success, msg, comment
 
-    def get_note_all_comment(self, url: str, cookies_str: str, proxies: dict = None):
+    def iter_note_all_inner_comment(self, out_comment_list: list, xsec_token: str, cookies_str: str, proxies: dict = None, max_workers: int = 4):
+        """
+            并发获取多条一级评论的全部二级评论，每条完成后立即返回
+            :param out_comment_list 笔记的一级评论
+            :param max_workers 同时获取的一级评论数
+            按完成顺序 yield 每条一级评论的 (success, msg, comment)
+        """
+        executor = ThreadPoolExecutor(max(max_workers, 1))
+        futures = [executor.submit(self.get_note_all_inner_comment, comment, xsec_token, cookies_str, proxies) for comment in out_comment_list]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # 调用方提前结束迭代时取消未开始的请求
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def iter_note_all_comment(self, url: str, cookies_str: str, proxies: dict = None, max_workers: int = 4):
+        """
+            获取一篇文章的所有评论，二级评论并发获取
+            :param url: 你想要获取的笔记的url
+            :param cookies_str: 你的cookies
+            :param max_workers: 同时获取二级评论的一级评论数
+            按完成顺序 yield 每条一级评论的 (success, msg, comment)，一级评论获取失败时 yield (False, msg, None)
+        """
+        try:
+            urlParse = urllib.parse.urlparse(url)
+            note_id = urlParse.path.split("/")[-1]
+            kvs = urlParse.query.split('&')
+            kvDist = {kv.split('=')[0]: kv.split('=')[1] for kv in kvs}
+            success, msg, out_comment_list = self.get_note_all_out_comment(note_id, kvDist['xsec_token'], cookies_str, proxies)
+            if not success:
+                raise Exception(msg)
+        except Exception as e:
+            yield False, str(e), None
+            return
+        yield from self.iter_note_all_inner_comment(out_comment_list, kvDist['xsec_token'], cookies_str, proxies, max_workers)
+
+    def get_note_all_comment(self, url: str, cookies_str: str, proxies: dict = None, max_workers: int = 4):
         """
             获取一篇文章的所有评论
-            :param note_id: 你想要获取的笔记的id
+            :param url: 你想要获取的笔记的url
             :param cookies_str: 你的cookies
-            返回一篇文章的所有评论
+            :param max_workers: 同时获取二级评论的一级评论数
+            返回一篇文章的所有评论，某条评论的二级评论获取失败时保留已获取的部分
         """
         out_comment_list = []
         try:
@@ -744,10 +1045,14 @@ class XHS_Apis():
             success, msg, out_comment_list = self.get_note_all_out_comment(note_id, kvDist['xsec_token'], cookies_str, proxies)
             if not success:
                 raise Exception(msg)
-            for comment in out_comment_list:
-                success, msg, new_comment = self.get_note_all_inner_comment(comment, kvDist['xsec_token'], cookies_str, proxies)
-                if not success:
-                    raise Exception(msg)
+            # 二级评论直接写入 out_comment_list 中的评论，保持原有顺序
+            failed = 0
+            for comment_success, comment_msg, comment in self.iter_note_all_inner_comment(out_comment_list, kvDist['xsec_token'], cookies_str, proxies, max_workers):
+                if not comment_success:
+                    failed += 1
+                    logger.warning(f'获取二级评论失败 {comment.get("id")}: {comment_msg}')
+            if failed:
+                msg = f'{failed}条一级评论的二级评论获取失败'
         except Exception as e:
             success = False
             msg = str(e)
@@ -763,7 +1068,7 @@ class XHS_Apis():
         try:
             api = "/api/sns/web/unread_count"
             headers, cookies, data = generate_request_params(cookies_str, api, '', 'GET')
-            response = requests.get(self.base_url + api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self.get_session(cookies_str, proxies).get(self.base_url + api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -787,7 +1092,7 @@ class XHS_Apis():
             }
             splice_api = splice_str(api, params)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self.get_session(cookies_str, proxies).get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -795,27 +1100,48 @@ class XHS_Apis():
             msg = str(e)
         return success, msg, res_json
 
+    def iter_all_metions(self, cookies_str: str, proxies: dict = None, prefetch: int = 0, resume: bool = True):
+        """
+            逐页获取全部的评论和@提醒
+            :param cookies_str: 你的cookies
+            每获取一页就 yield 该页的每条评论和@提醒，获取失败时抛出异常
+            开启断点时从上次中断的页继续
+            :param prefetch: 大于0时处理当前页的同时请求下一页
+            :param resume: 为False时不读取也不记录断点，调用方把结果全部收集后才使用时传False
+        """
+        endpoint = 'all_metions'
+        entity_id = self.session_pool.identity(cookies_str)[0]
+        cursor = ''
+        checkpoint = self.load_checkpoint(endpoint, entity_id, resume=resume)
+        if checkpoint:
+            cursor = checkpoint['cursor']
+        pages = self.iter_cursor_pages(lambda cursor: self.get_metions(cursor, cookies_str, proxies), cursor, prefetch)
+        for success, msg, res_json in pages:
+            if not success:
+                raise Exception(msg)
+            messages = res_json["data"]["message_list"]
+            if 'cursor' in res_json["data"]:
+                cursor = str(res_json["data"]["cursor"])
+            else:
+                self.save_checkpoint(endpoint, entity_id, cursor, False, resume=resume)
+                break
+            yield from messages
+            has_more = res_json["data"]["has_more"]
+            self.save_checkpoint(endpoint, entity_id, cursor, has_more, resume=resume)
+            if not has_more:
+                break
+
     def get_all_metions(self, cookies_str: str, proxies: dict = None):
         """
             获取全部的评论和@提醒
             :param cookies_str: 你的cookies
             返回全部的评论和@提醒
         """
-        cursor = ''
         metions_list = []
         try:
-            while True:
-                success, msg, res_json = self.get_metions(cursor, cookies_str, proxies)
-                if not success:
-                    raise Exception(msg)
-                metions = res_json["data"]["message_list"]
-                if 'cursor' in res_json["data"]:
-                    cursor = str(res_json["data"]["cursor"])
-                else:
-                    break
-                metions_list.extend(metions)
-                if not res_json["data"]["has_more"]:
-                    break
+            for message in self.iter_all_metions(cookies_str, proxies, resume=False):
+                metions_list.append(message)
+            success, msg = True, 'success'
         except Exception as e:
             success = False
             msg = str(e)
@@ -837,7 +1163,7 @@ class XHS_Apis():
             }
             splice_api = splice_str(api, params)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self.get_session(cookies_str, proxies).get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -845,27 +1171,48 @@ class XHS_Apis():
             msg = str(e)
         return success, msg, res_json
 
+    def iter_all_likesAndcollects(self, cookies_str: str, proxies: dict = None, prefetch: int = 0, resume: bool = True):
+        """
+            逐页获取全部的赞和收藏
+            :param cookies_str: 你的cookies
+            每获取一页就 yield 该页的每条赞和收藏，获取失败时抛出异常
+            开启断点时从上次中断的页继续
+            :param prefetch: 大于0时处理当前页的同时请求下一页
+            :param resume: 为False时不读取也不记录断点，调用方把结果全部收集后才使用时传False
+        """
+        endpoint = 'all_likesAndcollects'
+        entity_id = self.session_pool.identity(cookies_str)[0]
+        cursor = ''
+        checkpoint = self.load_checkpoint(endpoint, entity_id, resume=resume)
+        if checkpoint:
+            cursor = checkpoint['cursor']
+        pages = self.iter_cursor_pages(lambda cursor: self.get_likesAndcollects(cursor, cookies_str, proxies), cursor, prefetch)
+        for success, msg, res_json in pages:
+            if not success:
+                raise Exception(msg)
+            messages = res_json["data"]["message_list"]
+            if 'cursor' in res_json["data"]:
+                cursor = str(res_json["data"]["cursor"])
+            else:
+                self.save_checkpoint(endpoint, entity_id, cursor, False, resume=resume)
+                break
+            yield from messages
+            has_more = res_json["data"]["has_more"]
+            self.save_checkpoint(endpoint, entity_id, cursor, has_more, resume=resume)
+            if not has_more:
+                break
+
     def get_all_likesAndcollects(self, cookies_str: str, proxies: dict = None):
         """
             获取全部的赞和收藏
             :param cookies_str: 你的cookies
             返回全部的赞和收藏
         """
-        cursor = ''
         likesAndcollects_list = []
         try:
-            while True:
-                success, msg, res_json = self.get_likesAndcollects(cursor, cookies_str, proxies)
-                if not success:
-                    raise Exception(msg)
-                likesAndcollects = res_json["data"]["message_list"]
-                if 'cursor' in res_json["data"]:
-                    cursor = str(res_json["data"]["cursor"])
-                else:
-                    break
-                likesAndcollects_list.extend(likesAndcollects)
-                if not res_json["data"]["has_more"]:
-                    break
+            for message in self.iter_all_likesAndcollects(cookies_str, proxies, resume=False):
+                likesAndcollects_list.append(message)
+            success, msg = True, 'success'
         except Exception as e:
             success = False
             msg = str(e)
@@ -887,7 +1234,7 @@ class XHS_Apis():
             }
             splice_api = splice_str(api, params)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self.get_session(cookies_str, proxies).get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -895,27 +1242,48 @@ class XHS_Apis():
             msg = str(e)
         return success, msg, res_json
 
+    def iter_all_new_connections(self, cookies_str: str, proxies: dict = None, prefetch: int = 0, resume: bool = True):
+        """
+            逐页获取全部的新增关注
+            :param cookies_str: 你的cookies
+            每获取一页就 yield 该页的每条新增关注，获取失败时抛出异常
+            开启断点时从上次中断的页继续
+            :param prefetch: 大于0时处理当前页的同时请求下一页
+            :param resume: 为False时不读取也不记录断点，调用方把结果全部收集后才使用时传False
+        """
+        endpoint = 'all_new_connections'
+        entity_id = self.session_pool.identity(cookies_str)[0]
+        cursor = ''
+        checkpoint = self.load_checkpoint(endpoint, entity_id, resume=resume)
+        if checkpoint:
+            cursor = checkpoint['cursor']
+        pages = self.iter_cursor_pages(lambda cursor: self.get_new_connections(cursor, cookies_str, proxies), cursor, prefetch)
+        for success, msg, res_json in pages:
+            if not success:
+                raise Exception(msg)
+            messages = res_json["data"]["message_list"]
+            if 'cursor' in res_json["data"]:
+                cursor = str(res_json["data"]["cursor"])
+            else:
+                self.save_checkpoint(endpoint, entity_id, cursor, False, resume=resume)
+                break
+            yield from messages
+            has_more = res_json["data"]["has_more"]
+            self.save_checkpoint(endpoint, entity_id, cursor, has_more, resume=resume)
+            if not has_more:
+                break
+
     def get_all_new_connections(self, cookies_str: str, proxies: dict = None):
         """
             获取全部的新增关注
             :param cookies_str: 你的cookies
             返回全部的新增关注
         """
-        cursor = ''
         connections_list = []
         try:
-            while True:
-                success, msg, res_json = self.get_new_connections(cursor, cookies_str, proxies)
-                if not success:
-                    raise Exception(msg)
-                connections = res_json["data"]["message_list"]
-                if 'cursor' in res_json["data"]:
-                    cursor = str(res_json["data"]["cursor"])
-                else:
-                    break
-                connections_list.extend(connections)
-                if not res_json["data"]["has_more"]:
-                    break
+            for message in self.iter_all_new_connections(cookies_str, proxies, resume=False):
+                connections_list.append(message)
+            success, msg = True, 'success'
         except Exception as e:
             success = False
             msg = str(e)
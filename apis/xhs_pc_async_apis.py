@@ -0,0 +1,725 @@
+# encoding: utf-8
+import asyncio
+import functools
+import json
+import re
+import urllib
+import httpx
+from xhs_utils.xhs_util import splice_str, generate_request_params, generate_x_b3_traceid, get_common_headers
+from apis.xhs_pc_apis import XHS_Apis
+from loguru import logger
+
+"""
+    获小红书的api（异步版本）
+    与 XHS_Apis 的方法一一对应，调用时需要 await
+    :param max_concurrency: 同时进行的请求数上限
+"""
+class AsyncXHS_Apis():
+    status_forcelist = (429, 500, 502, 503, 504)
+
+    def __init__(self, max_concurrency: int = 20, timeout: float = 20, retries: int = 3, backoff_factor: float = 0.5):
+        self.base_url = "https://edith.xiaohongshu.com"
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._clients = {}
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+
+    def get_client(self, proxies: dict = None):
+        """
+            获取代理对应的复用连接的client
+        """
+        key = json.dumps(proxies or {}, sort_keys=True)
+        client = self._clients.get(key)
+        if client is None:
+            mounts = None
+            if proxies:
+                mounts = {f'{scheme}://': httpx.AsyncHTTPTransport(proxy=proxy) for scheme, proxy in proxies.items() if proxy}
+            limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+            client = httpx.AsyncClient(mounts=mounts, limits=limits, timeout=self.timeout)
+            self._clients[key] = client
+        return client
+
+    async def sign(self, cookies_str: str, api: str, data='', method='POST'):
+        """
+            签名在线程池中执行，不阻塞事件循环
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(generate_request_params, cookies_str, api, data, method))
+
+    async def request(self, method: str, api: str, cookies_str: str, data='', proxies: dict = None):
+        """
+            签名并发送请求，429/5xx 按指数退避重试
+            返回 success, msg, res_json
+        """
+        res_json = None
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            headers, cookies, data = await self.sign(cookies_str, api, data, method)
+            headers['cookie'] = '; '.join(f'{k}={v}' for k, v in cookies.items())
+            content = data.encode('utf-8') if data else None
+            client = self.get_client(proxies)
+            for attempt in range(self.retries + 1):
+                async with self._semaphore:
+                    response = await client.request(method, self.base_url + api, headers=headers, content=content)
+                if response.status_code not in self.status_forcelist or attempt == self.retries:
+                    break
+                await asyncio.sleep(self.backoff_factor * 2 ** attempt)
+            res_json = response.json()
+            success, msg = res_json["success"], res_json["msg"]
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, res_json
+
+    @staticmethod
+    def parse_url(url: str):
+        urlParse = urllib.parse.urlparse(url)
+        entity_id = urlParse.path.split("/")[-1]
+        kvs = urlParse.query.split('&')
+        kvDist = {kv.split('=')[0]: kv.split('=')[1] for kv in kvs if '=' in kv}
+        return entity_id, kvDist
+
+    async def get_homefeed_all_channel(self, cookies_str: str, proxies: dict = None):
+        """
+            获取主页的所有频道
+            返回主页的所有频道
+        """
+        api = "/api/sns/web/v1/homefeed/category"
+        return await self.request('GET', api, cookies_str, '', proxies)
+
+    async def get_homefeed_recommend(self, category, cursor_score, refresh_type, note_index, cookies_str: str, proxies: dict = None):
+        """
+            获取主页推荐的笔记
+            :param category: 你想要获取的频道
+            :param cursor_score: 你想要获取的笔记的cursor
+            :param refresh_type: 你想要获取的笔记的刷新类型
+            :param note_index: 你想要获取的笔记的index
+            :param cookies_str: 你的cookies
+            返回主页推荐的笔记
+        """
+        api = f"/api/sns/web/v1/homefeed"
+        data = {
+            "cursor_score": cursor_score,
+            "num": 20,
+            "refresh_type": refresh_type,
+            "note_index": note_index,
+            "unread_begin_note_id": "",
+            "unread_end_note_id": "",
+            "unread_note_count": 0,
+            "category": category,
+            "search_key": "",
+            "need_num": 10,
+            "image_formats": [
+                "jpg",
+                "webp",
+                "avif"
+            ],
+            "need_filter_image": False
+        }
+        return await self.request('POST', api, cookies_str, data, proxies)
+
+    async def get_homefeed_recommend_by_num(self, category, require_num, cookies_str: str, proxies: dict = None):
+        """
+            根据数量获取主页推荐的笔记
+            :param category: 你想要获取的频道
+            :param require_num: 你想要获取的笔记的数量
+            :param cookies_str: 你的cookies
+            根据数量返回主页推荐的笔记
+        """
+        cursor_score, refresh_type, note_index = "", 1, 0
+        note_list = []
+        try:
+            while True:
+                success, msg, res_json = await self.get_homefeed_recommend(category, cursor_score, refresh_type, note_index, cookies_str, proxies)
+                if not success:
+                    raise Exception(msg)
+                if "items" not in res_json["data"]:
+                    break
+                notes = res_json["data"]["items"]
+                note_list.extend(notes)
+                cursor_score = res_json["data"]["cursor_score"]
+                refresh_type = 3
+                note_index += 20
+                if len(note_list) > require_num:
+                    break
+        except Exception as e:
+            success = False
+            msg = str(e)
+        if len(note_list) > require_num:
+            note_list = note_list[:require_num]
+        return success, msg, note_list
+
+    async def get_user_info(self, user_id: str, cookies_str: str, proxies: dict = None):
+        """
+            获取用户的信息
+            :param user_id: 你想要获取的用户的id
+            :param cookies_str: 你的cookies
+            返回用户的信息
+        """
+        api = f"/api/sns/web/v1/user/otherinfo"
+        params = {
+            "target_user_id": user_id
+        }
+        return await self.request('GET', splice_str(api, params), cookies_str, '', proxies)
+
+    async def get_user_self_info(self, cookies_str: str, proxies: dict = None):
+        """
+            获取用户自己的信息1
+            :param cookies_str: 你的cookies
+            返回用户自己的信息1
+        """
+        api = f"/api/sns/web/v1/user/selfinfo"
+        return await self.request('GET', api, cookies_str, '', proxies)
+
+    async def get_user_self_info2(self, cookies_str: str, proxies: dict = None):
+        """
+            获取用户自己的信息2
+            :param cookies_str: 你的cookies
+            返回用户自己的信息2
+        """
+        api = f"/api/sns/web/v2/user/me"
+        return await self.request('GET', api, cookies_str, '', proxies)
+
+    async def get_user_note_info(self, user_id: str, cursor: str, cookies_str: str, xsec_token='', xsec_source='', proxies: dict = None):
+        """
+            获取用户指定位置的笔记
+            :param user_id: 你想要获取的用户的id
+            :param cursor: 你想要获取的笔记的cursor
+            :param cookies_str: 你的cookies
+            返回用户指定位置的笔记
+        """
+        api = f"/api/sns/web/v1/user_posted"
+        params = {
+            "num": "30",
+            "cursor": cursor,
+            "user_id": user_id,
+            "image_formats": "jpg,webp,avif",
+            "xsec_token": xsec_token,
+            "xsec_source": xsec_source,
+        }
+        return await self.request('GET', splice_str(api, params), cookies_str, '', proxies)
+
+    async def _get_user_all(self, page_func, user_url: str, cookies_str: str, default_source: str, proxies: dict = None):
+        cursor = ''
+        note_list = []
+        try:
+            user_id, kvDist = self.parse_url(user_url)
+            xsec_token = kvDist['xsec_token'] if 'xsec_token' in kvDist else ""
+            xsec_source = kvDist['xsec_source'] if 'xsec_source' in kvDist else default_source
+            while True:
+                success, msg, res_json = await page_func(user_id, cursor, cookies_str, xsec_token, xsec_source, proxies)
+                if not success:
+                    raise Exception(msg)
+                notes = res_json["data"]["notes"]
+                if 'cursor' in res_json["data"]:
+                    cursor = str(res_json["data"]["cursor"])
+                else:
+                    break
+                note_list.extend(notes)
+                if len(notes) == 0 or not res_json["data"]["has_more"]:
+                    break
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, note_list
+
+    async def get_user_all_notes(self, user_url: str, cookies_str: str, proxies: dict = None):
+        """
+           获取用户所有笔记
+           :param user_url: 你想要获取的用户的主页url
+           :param cookies_str: 你的cookies
+           返回用户的所有笔记
+        """
+        return await self._get_user_all(self.get_user_note_info, user_url, cookies_str, "pc_search", proxies)
+
+    async def get_user_like_note_info(self, user_id: str, cursor: str, cookies_str: str, xsec_token='', xsec_source='', proxies: dict = None):
+        """
+            获取用户指定位置喜欢的笔记
+            :param user_id: 你想要获取的用户的id
+            :param cursor: 你想要获取的笔记的cursor
+            :param cookies_str: 你的cookies
+            返回用户指定位置喜欢的笔记
+        """
+        api = f"/api/sns/web/v1/note/like/page"
+        params = {
+            "num": "30",
+            "cursor": cursor,
+            "user_id": user_id,
+            "image_formats": "jpg,webp,avif",
+            "xsec_token": xsec_token,
+            "xsec_source": xsec_source,
+        }
+        return await self.request('GET', splice_str(api, params), cookies_str, '', proxies)
+
+    async def get_user_all_like_note_info(self, user_url: str, cookies_str: str, proxies: dict = None):
+        """
+            获取用户所有喜欢笔记
+            :param user_url: 你想要获取的用户的主页url
+            :param cookies_str: 你的cookies
+            返回用户的所有喜欢笔记
+        """
+        return await self._get_user_all(self.get_user_like_note_info, user_url, cookies_str, "pc_user", proxies)
+
+    async def get_user_collect_note_info(self, user_id: str, cursor: str, cookies_str: str, xsec_token='', xsec_source='', proxies: dict = None):
+        """
+            获取用户指定位置收藏的笔记
+            :param user_id: 你想要获取的用户的id
+            :param cursor: 你想要获取的笔记的cursor
+            :param cookies_str: 你的cookies
+            返回用户指定位置收藏的笔记
+        """
+        api = f"/api/sns/web/v2/note/collect/page"
+        params = {
+            "num": "30",
+            "cursor": cursor,
+            "user_id": user_id,
+            "image_formats": "jpg,webp,avif",
+            "xsec_token": xsec_token,
+            "xsec_source": xsec_source,
+        }
+        return await self.request('GET', splice_str(api, params), cookies_str, '', proxies)
+
+    async def get_user_all_collect_note_info(self, user_url: str, cookies_str: str, proxies: dict = None):
+        """
+            获取用户所有收藏笔记
+            :param user_url: 你想要获取的用户的主页url
+            :param cookies_str: 你的cookies
+            返回用户的所有收藏笔记
+        """
+        return await self._get_user_all(self.get_user_collect_note_info, user_url, cookies_str, "pc_search", proxies)
+
+    async def get_note_info(self, url: str, cookies_str: str, proxies: dict = None):
+        """
+            获取笔记的详细
+            :param url: 你想要获取的笔记的url
+            :param cookies_str: 你的cookies
+            返回笔记的详细
+        """
+        try:
+            note_id, kvDist = self.parse_url(url)
+            data = {
+                "source_note_id": note_id,
+                "image_formats": [
+                    "jpg",
+                    "webp",
+                    "avif"
+                ],
+                "extra": {
+                    "need_body_topic": "1"
+                },
+                "xsec_source": kvDist['xsec_source'] if 'xsec_source' in kvDist else "pc_search",
+                "xsec_token": kvDist['xsec_token']
+            }
+        except Exception as e:
+            return False, str(e), None
+        api = f"/api/sns/web/v1/feed"
+        return await self.request('POST', api, cookies_str, data, proxies)
+
+    async def get_search_keyword(self, word: str, cookies_str: str, proxies: dict = None):
+        """
+            获取搜索关键词
+            :param word: 你的关键词
+            :param cookies_str: 你的cookies
+            返回搜索关键词
+        """
+        api = "/api/sns/web/v1/search/recommend"
+        params = {
+            "keyword": urllib.parse.quote(word)
+        }
+        return await self.request('GET', splice_str(api, params), cookies_str, '', proxies)
+
+    async def search_note(self, query: str, cookies_str: str, page=1, sort_type_choice=0, note_type=0, note_time=0, note_range=0, pos_distance=0, geo="", proxies: dict = None):
+        """
+            获取搜索笔记的结果
+            :param query 搜索的关键词
+            :param cookies_str 你的cookies
+            :param page 搜索的页数
+            :param sort_type_choice 排序方式 0 综合排序, 1 最新, 2 最多点赞, 3 最多评论, 4 最多收藏
+            :param note_type 笔记类型 0 不限, 1 视频笔记, 2 普通笔记
+            :param note_time 笔记时间 0 不限, 1 一天内, 2 一周内天, 3 半年内
+            :param note_range 笔记范围 0 不限, 1 已看过, 2 未看过, 3 已关注
+            :param pos_distance 位置距离 0 不限, 1 同城, 2 附近 指定这个必须要指定 geo
+            返回搜索的结果
+        """
+        sort_type = ["general", "time_descending", "popularity_descending", "comment_descending", "collect_descending"][sort_type_choice] if sort_type_choice in range(5) else "general"
+        filter_note_type = {1: "视频笔记", 2: "普通笔记"}.get(note_type, "不限")
+        filter_note_time = {1: "一天内", 2: "一周内", 3: "半年内"}.get(note_time, "不限")
+        filter_note_range = {1: "已看过", 2: "未看过", 3: "已关注"}.get(note_range, "不限")
+        filter_pos_distance = {1: "同城", 2: "附近"}.get(pos_distance, "不限")
+        if geo:
+            geo = json.dumps(geo, separators=(',', ':'))
+        api = "/api/sns/web/v1/search/notes"
+        data = {
+            "keyword": query,
+            "page": page,
+            "page_size": 20,
+            "search_id": generate_x_b3_traceid(21),
+            "sort": "general",
+            "note_type": 0,
+            "ext_flags": [],
+            "filters": [
+                {"tags": [sort_type], "type": "sort_type"},
+                {"tags": [filter_note_type], "type": "filter_note_type"},
+                {"tags": [filter_note_time], "type": "filter_note_time"},
+                {"tags": [filter_note_range], "type": "filter_note_range"},
+                {"tags": [filter_pos_distance], "type": "filter_pos_distance"}
+            ],
+            "geo": geo,
+            "image_formats": [
+                "jpg",
+                "webp",
+                "avif"
+            ]
+        }
+        return await self.request('POST', api, cookies_str, data, proxies)
+
+    async def search_some_note(self, query: str, require_num: int, cookies_str: str, sort_type_choice=0, note_type=0, note_time=0, note_range=0, pos_distance=0, geo="", proxies: dict = None):
+        """
+            指定数量搜索笔记，设置排序方式和笔记类型和笔记数量
+            :param query 搜索的关键词
+            :param require_num 搜索的数量
+            :param cookies_str 你的cookies
+            :param sort_type_choice 排序方式 0 综合排序, 1 最新, 2 最多点赞, 3 最多评论, 4 最多收藏
+            :param note_type 笔记类型 0 不限, 1 视频笔记, 2 普通笔记
+            :param note_time 笔记时间 0 不限, 1 一天内, 2 一周内天, 3 半年内
+            :param note_range 笔记范围 0 不限, 1 已看过, 2 未看过, 3 已关注
+            :param pos_distance 位置距离 0 不限, 1 同城, 2 附近 指定这个必须要指定 geo
+            :param geo: 定位信息 经纬度
+            返回搜索的结果
+        """
+        page = 1
+        note_list = []
+        try:
+            while True:
+                success, msg, res_json = await self.search_note(query, cookies_str, page, sort_type_choice, note_type, note_time, note_range, pos_distance, geo, proxies)
+                if not success:
+                    raise Exception(msg)
+                if "items" not in res_json["data"]:
+                    break
+                notes = res_json["data"]["items"]
+                note_list.extend(notes)
+                page += 1
+                if len(note_list) >= require_num or not res_json["data"]["has_more"]:
+                    break
+        except Exception as e:
+            success = False
+            msg = str(e)
+        if len(note_list) > require_num:
+            note_list = note_list[:require_num]
+        return success, msg, note_list
+
+    async def search_user(self, query: str, cookies_str: str, page=1, proxies: dict = None):
+        """
+            获取搜索用户的结果
+            :param query 搜索的关键词
+            :param cookies_str 你的cookies
+            :param page 搜索的页数
+            返回搜索的结果
+        """
+        api = "/api/sns/web/v1/search/usersearch"
+        data = {
+            "search_user_request": {
+                "keyword": query,
+                "search_id": "2dn9they1jbjxwawlo4xd",
+                "page": page,
+                "page_size": 15,
+                "biz_type": "web_search_user",
+                "request_id": "22471139-1723999898524"
+            }
+        }
+        return await self.request('POST', api, cookies_str, data, proxies)
+
+    async def search_some_user(self, query: str, require_num: int, cookies_str: str, proxies: dict = None):
+        """
+            指定数量搜索用户
+            :param query 搜索的关键词
+            :param require_num 搜索的数量
+            :param cookies_str 你的cookies
+            返回搜索的结果
+        """
+        page = 1
+        user_list = []
+        try:
+            while True:
+                success, msg, res_json = await self.search_user(query, cookies_str, page, proxies)
+                if not success:
+                    raise Exception(msg)
+                if "users" not in res_json["data"]:
+                    break
+                users = res_json["data"]["users"]
+                user_list.extend(users)
+                page += 1
+                if len(user_list) >= require_num or not res_json["data"]["has_more"]:
+                    break
+        except Exception as e:
+            success = False
+            msg = str(e)
+        if len(user_list) > require_num:
+            user_list = user_list[:require_num]
+        return success, msg, user_list
+
+    async def get_note_out_comment(self, note_id: str, cursor: str, xsec_token: str, cookies_str: str, proxies: dict = None):
+        """
+            获取指定位置的笔记一级评论
+            :param note_id 笔记的id
+            :param cursor 指定位置的评论的cursor
+            :param cookies_str 你的cookies
+            返回指定位置的笔记一级评论
+        """
+        api = "/api/sns/web/v2/comment/page"
+        params = {
+            "note_id": note_id,
+            "cursor": cursor,
+            "top_comment_id": "",
+            "image_formats": "jpg,webp,avif",
+            "xsec_token": xsec_token
+        }
+        return await self.request('GET', splice_str(api, params), cookies_str, '', proxies)
+
+    async def get_note_all_out_comment(self, note_id: str, xsec_token: str, cookies_str: str, proxies: dict = None):
+        """
+            获取笔记的全部一级评论
+            :param note_id 笔记的id
+            :param cookies_str 你的cookies
+            返回笔记的全部一级评论
+        """
+        cursor = ''
+        note_out_comment_list = []
+        try:
+            while True:
+                success, msg, res_json = await self.get_note_out_comment(note_id, cursor, xsec_token, cookies_str, proxies)
+                if not success:
+                    raise Exception(msg)
+                comments = res_json["data"]["comments"]
+                if 'cursor' in res_json["data"]:
+                    cursor = str(res_json["data"]["cursor"])
+                else:
+                    break
+                note_out_comment_list.extend(comments)
+                if len(note_out_comment_list) == 0 or not res_json["data"]["has_more"]:
+                    break
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, note_out_comment_list
+
+    async def get_note_inner_comment(self, comment: dict, cursor: str, xsec_token: str, cookies_str: str, proxies: dict = None):
+        """
+            获取指定位置的笔记二级评论
+            :param comment 笔记的一级评论
+            :param cursor 指定位置的评论的cursor
+            :param cookies_str 你的cookies
+            返回指定位置的笔记二级评论
+        """
+        api = "/api/sns/web/v2/comment/sub/page"
+        params = {
+            "note_id": comment['note_id'],
+            "root_comment_id": comment['id'],
+            "num": "10",
+            "cursor": cursor,
+            "image_formats": "jpg,webp,avif",
+            "top_comment_id": '',
+            "xsec_token": xsec_token
+        }
+        return await self.request('GET', splice_str(api, params), cookies_str, '', proxies)
+
+    async def get_note_all_inner_comment(self, comment: dict, xsec_token: str, cookies_str: str, proxies: dict = None):
+        """
+            获取笔记的全部二级评论
+            :param comment 笔记的一级评论
+            :param cookies_str 你的cookies
+            返回笔记的全部二级评论
+        """
+        try:
+            if not comment['sub_comment_has_more']:
+                return True, 'success', comment
+            cursor = comment['sub_comment_cursor']
+            inner_comment_list = []
+            while True:
+                success, msg, res_json = await self.get_note_inner_comment(comment, cursor, xsec_token, cookies_str, proxies)
+                if not success:
+                    raise Exception(msg)
+                comments = res_json["data"]["comments"]
+                if 'cursor' in res_json["data"]:
+                    cursor = str(res_json["data"]["cursor"])
+                else:
+                    break
+                inner_comment_list.extend(comments)
+                if not res_json["data"]["has_more"]:
+                    break
+            comment['sub_comments'].extend(inner_comment_list)
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, comment
+
+    async def get_note_all_comment(self, url: str, cookies_str: str, proxies: dict = None):
+        """
+            获取一篇文章的所有评论，二级评论并发获取
+            :param url: 你想要获取的笔记的url
+            :param cookies_str: 你的cookies
+            返回一篇文章的所有评论
+        """
+        out_comment_list = []
+        try:
+            note_id, kvDist = self.parse_url(url)
+            success, msg, out_comment_list = await self.get_note_all_out_comment(note_id, kvDist['xsec_token'], cookies_str, proxies)
+            if not success:
+                raise Exception(msg)
+            results = await asyncio.gather(*[self.get_note_all_inner_comment(comment, kvDist['xsec_token'], cookies_str, proxies) for comment in out_comment_list])
+            for success, msg, new_comment in results:
+                if not success:
+                    raise Exception(msg)
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, out_comment_list
+
+    async def get_unread_message(self, cookies_str: str, proxies: dict = None):
+        """
+            获取未读消息
+            :param cookies_str: 你的cookies
+            返回未读消息
+        """
+        api = "/api/sns/web/unread_count"
+        return await self.request('GET', api, cookies_str, '', proxies)
+
+    async def _get_all_messages(self, page_func, cookies_str: str, proxies: dict = None):
+        cursor = ''
+        message_list = []
+        try:
+            while True:
+                success, msg, res_json = await page_func(cursor, cookies_str, proxies)
+                if not success:
+                    raise Exception(msg)
+                messages = res_json["data"]["message_list"]
+                if 'cursor' in res_json["data"]:
+                    cursor = str(res_json["data"]["cursor"])
+                else:
+                    break
+                message_list.extend(messages)
+                if not res_json["data"]["has_more"]:
+                    break
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, message_list
+
+    async def get_metions(self, cursor: str, cookies_str: str, proxies: dict = None):
+        """
+            获取评论和@提醒
+            :param cursor: 你想要获取的评论和@提醒的cursor
+            :param cookies_str: 你的cookies
+            返回评论和@提醒
+        """
+        api = "/api/sns/web/v1/you/mentions"
+        params = {
+            "num": "20",
+            "cursor": cursor
+        }
+        return await self.request('GET', splice_str(api, params), cookies_str, '', proxies)
+
+    async def get_all_metions(self, cookies_str: str, proxies: dict = None):
+        """
+            获取全部的评论和@提醒
+            :param cookies_str: 你的cookies
+            返回全部的评论和@提醒
+        """
+        return await self._get_all_messages(self.get_metions, cookies_str, proxies)
+
+    async def get_likesAndcollects(self, cursor: str, cookies_str: str, proxies: dict = None):
+        """
+            获取赞和收藏
+            :param cursor: 你想要获取的赞和收藏的cursor
+            :param cookies_str: 你的cookies
+            返回赞和收藏
+        """
+        api = "/api/sns/web/v1/you/likes"
+        params = {
+            "num": "20",
+            "cursor": cursor
+        }
+        return await self.request('GET', splice_str(api, params), cookies_str, '', proxies)
+
+    async def get_all_likesAndcollects(self, cookies_str: str, proxies: dict = None):
+        """
+            获取全部的赞和收藏
+            :param cookies_str: 你的cookies
+            返回全部的赞和收藏
+        """
+        return await self._get_all_messages(self.get_likesAndcollects, cookies_str, proxies)
+
+    async def get_new_connections(self, cursor: str, cookies_str: str, proxies: dict = None):
+        """
+            获取新增关注
+            :param cursor: 你想要获取的新增关注的cursor
+            :param cookies_str: 你的cookies
+            返回新增关注
+        """
+        api = "/api/sns/web/v1/you/connections"
+        params = {
+            "num": "20",
+            "cursor": cursor
+        }
+        return await self.request('GET', splice_str(api, params), cookies_str, '', proxies)
+
+    async def get_all_new_connections(self, cookies_str: str, proxies: dict = None):
+        """
+            获取全部的新增关注
+            :param cookies_str: 你的cookies
+            返回全部的新增关注
+        """
+        return await self._get_all_messages(self.get_new_connections, cookies_str, proxies)
+
+    async def get_note_no_water_video(self, note_id, proxies: dict = None):
+        """
+            获取笔记无水印视频
+            :param note_id: 你想要获取的笔记的id
+            返回笔记无水印视频
+        """
+        success = True
+        msg = '成功'
+        video_addr = None
+        try:
+            headers = get_common_headers()
+            url = f"https://www.xiaohongshu.com/explore/{note_id}"
+            response = await self.get_client(proxies).get(url, headers=headers)
+            res = response.text
+            video_addr = re.findall(r'<meta name="og:video" content="(.*?)">', res)[0]
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, video_addr
+
+    get_note_no_water_img = staticmethod(XHS_Apis.get_note_no_water_img)
+
+
+if __name__ == '__main__':
+    """
+        此文件为小红书异步api的使用示例
+    """
+    async def main():
+        cookies_str = r''
+        note_urls = [
+            r'https://www.xiaohongshu.com/explore/67d7c713000000000900e391?xsec_token=AB1ACxbo5cevHxV_bWibTmK8R1DDz0NnAW1PbFZLABXtE=&xsec_source=pc_user',
+        ]
+        async with AsyncXHS_Apis(max_concurrency=10) as xhs_apis:
+            results = await asyncio.gather(*[xhs_apis.get_note_info(note_url, cookies_str) for note_url in note_urls])
+            for note_url, (success, msg, note_info) in zip(note_urls, results):
+                logger.info(f'获取笔记信息结果 {json.dumps(note_info, ensure_ascii=False)}: {success}, msg: {msg}')
+
+    asyncio.run(main())
@@ -1,21 +1,66 @@
 import json
 import os
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
 from apis.xhs_pc_apis import XHS_Apis
-from xhs_utils.common_util import init
+from xhs_utils.common_util import init, RateLimiter
+from xhs_utils.checkpoint_util import CheckpointStore
+from xhs_utils.cache_util import ResponseCache
 from xhs_utils.data_util import handle_note_info, download_note, save_to_xlsx, save_processed_note_list_to_xlsx
+from xhs_utils.download_util import MediaStore
+from xhs_utils.note_index_util import NoteIndex
+from xhs_utils.relevance_util import RelevanceFilter
 from qwen_utils.qwen import QwenClient
+from qwen_utils.qwen_cache import LlmCache
 from static.ZHEJIANG_DIVISIONS import ZHEJIANG_DIVISIONS
 
 
 class Data_Spider():
-    def __init__(self):
-        self.xhs_apis = XHS_Apis()
-        self.qwen_client = QwenClient("qwen-plus")
+    def __init__(self, max_workers: int = 1, host_rate: float = 0, resume: bool = False, download_workers: int = None, incremental: bool = False, cache: bool = False, llm_cache: bool = True, llm_workers: int = 4, rpm: int = 0, tpm: int = 0, llm_batch_tokens: int = 0, relevance_threshold: float = 2):
+        """
+        :param max_workers: 并发爬取笔记详情、下载媒体的线程数，为1时串行
+        :param host_rate: 每个host每秒的最大请求数，为0时不限速
+        :param resume: 翻页中断后下次运行是否从断点继续
+        :param download_workers: 所有笔记共用的同时下载连接数，默认读取环境变量 XHS_DOWNLOAD_WORKERS
+        :param incremental: 是否跳过之前已经爬取过且没有变化的笔记
+        :param cache: 是否缓存接口结果，有效期内相同参数的请求不再发送
+        :param llm_cache: 是否缓存大模型提取的结果，相同笔记内容不再重复调用
+        :param llm_workers: 同时调用大模型提取笔记信息的数量
+        :param rpm: 大模型每分钟最大请求数，0为不限制
+        :param tpm: 大模型每分钟最大token数，0为不限制
+        :param llm_batch_tokens: 大于0时多篇笔记合并为一次大模型请求，每次请求的笔记文本不超过这个估算token数
+        :param relevance_threshold: 大模型提取前相关性打分的阈值，低于阈值的笔记跳过，为None时不过滤
+        """
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(host_rate)
+        # 媒体的每个请求按所在的cdn限速
+        self.downloader = MediaStore(download_workers, rate_limiter=self.rate_limiter)
+        self.note_index = NoteIndex() if incremental else None
+        self.xhs_apis = XHS_Apis(checkpoint_store=CheckpointStore() if resume else None, response_cache=ResponseCache() if cache else None)
+        self.llm_workers = llm_workers
+        self.llm_batch_tokens = llm_batch_tokens
+        self.relevance_filter = RelevanceFilter(relevance_threshold) if relevance_threshold is not None else None
+        self.qwen_client = QwenClient("qwen-plus", cache=LlmCache() if llm_cache else None, rpm=rpm, tpm=tpm)
         from sql_utils.sql_connector import SqlConnector
         self._sql_conn = SqlConnector()
+        self._court_indexes = {}
+
+    def court_index(self, province: str, city: str, state: str):
+        """
+        返回该区县的球场索引，第一次使用时从数据库载入
+        """
+        from sql_utils.court_index import CourtIndex
+        key = (province, city, state)
+        if key not in self._court_indexes:
+            self._court_indexes[key] = CourtIndex(self._sql_conn, province, city, state)
+            logger.info(f'已载入 {province}{city}{state} 的 {len(self._court_indexes[key])} 个已有球场')
+        return self._court_indexes[key]
 
     def close(self):
+        self.downloader.close()
+        if self.note_index is not None:
+            self.note_index.close()
         if hasattr(self, '_sql_conn') and self._sql_conn:
             self._sql_conn.close()
 
@@ -28,6 +73,7 @@ class Data_Spider():
         """
         note_info = None
         try:
+            self.rate_limiter.wait(self.xhs_apis.base_url)
             success, msg, note_info = self.xhs_apis.get_note_info(note_url, cookies_str, proxies)
             if success:
                 note_info = note_info['data']['items'][0]
@@ -40,6 +86,75 @@ class Data_Spider():
         logger.info(f'爬取笔记信息 {note_url}: {success}, msg: {msg}')
         return success, msg, note_info
 
+    def is_note_changed(self, note_info: dict):
+        """
+        返回笔记是否需要后续处理，未开启增量时总是返回True
+        需要处理的笔记此时不记录到笔记索引，处理完成后由 mark_note_done 记录；内容没有变化的笔记只刷新互动数量
+        """
+        if self.note_index is None or self.note_index.is_changed(note_info):
+            return True
+        self.note_index.update(note_info)
+        logger.info(f'笔记内容没有变化，只刷新互动数量 {note_info["note_url"]}')
+        return False
+
+    def mark_note_done(self, note_info: dict):
+        """
+        笔记的下载、提取、入库都已完成，记录到笔记索引
+        """
+        if self.note_index is not None:
+            self.note_index.update(note_info)
+
+    def skip_fresh_notes(self, notes: list):
+        """
+        去掉笔记索引中仍在有效期内的笔记url，未开启增量时原样返回
+        """
+        if self.note_index is None:
+            return notes
+        stale_notes = [note_url for note_url in notes if not self.note_index.is_fresh(urllib.parse.urlparse(note_url).path.split('/')[-1])]
+        logger.info(f'增量爬取: {len(notes)} 篇笔记中 {len(notes) - len(stale_notes)} 篇仍在有效期内，跳过')
+        return stale_notes
+
+    def spider_note_list(self, notes: list, cookies_str: str, base_path: dict, save_choice: str, proxies=None, failed_notes: set = None):
+        """
+        爬取笔记详情并下载媒体，max_workers > 1 时并发执行
+        返回爬取成功的笔记，顺序与 notes 一致，开启增量时内容没有变化的笔记只刷新互动数量，不下载也不返回
+        :param notes:
+        :param cookies_str:
+        :param base_path:
+        :param failed_notes: 媒体下载失败的笔记id会加入其中
+        :return:
+        """
+        save_media = save_choice == 'all' or 'media' in save_choice
+
+        def download(note_info):
+            try:
+                download_note(note_info, base_path['media'], save_choice, self.downloader)
+            except Exception as e:
+                logger.error(f'下载笔记媒体失败 {note_info["note_url"]}: {e}')
+                if failed_notes is not None:
+                    failed_notes.add(note_info['note_id'])
+
+        if self.max_workers <= 1:
+            note_list = []
+            for note_url in notes:
+                success, msg, note_info = self.spider_note(note_url, cookies_str, proxies)
+                if note_info is not None and success and self.is_note_changed(note_info):
+                    note_list.append(note_info)
+            for note_info in note_list:
+                if save_media:
+                    download(note_info)
+            return note_list
+
+        note_list = []
+        with ThreadPoolExecutor(self.max_workers) as fetch_executor, ThreadPoolExecutor(self.max_workers) as download_executor:
+            # map 按提交顺序返回结果，某篇笔记爬取完成后立即提交下载
+            for success, msg, note_info in fetch_executor.map(lambda note_url: self.spider_note(note_url, cookies_str, proxies), notes):
+                if note_info is not None and success and self.is_note_changed(note_info):
+                    note_list.append(note_info)
+                    if save_media:
+                        download_executor.submit(download, note_info)
+        return note_list
+
     def spider_some_note(self, province, city, state, notes: list, cookies_str: str, base_path: dict, save_choice: str, excel_name: str = '', proxies=None):
         """
         爬取一些笔记的信息
@@ -50,22 +165,29 @@ class Data_Spider():
         """
         if (save_choice == 'all' or save_choice == 'excel') and excel_name == '':
             raise ValueError('excel_name 不能为空')
-        note_list = []
-        for note_url in notes:
-            success, msg, note_info = self.spider_note(note_url, cookies_str, proxies)
-            if note_info is not None and success:
-                note_list.append(note_info)
-        for note_info in note_list:
-            if save_choice == 'all' or 'media' in save_choice:
-                download_note(note_info, base_path['media'], save_choice)
+        notes = self.skip_fresh_notes(notes)
+        failed_notes = set()
+        note_list = self.spider_note_list(notes, cookies_str, base_path, save_choice, proxies, failed_notes)
+        if not (save_choice == 'all' or save_choice == 'excel'):
+            for note_info in note_list:
+                if note_info['note_id'] not in failed_notes:
+                    self.mark_note_done(note_info)
         if save_choice == 'all' or save_choice == 'excel':
             file_path = os.path.abspath(os.path.join(base_path['excel'], f'{excel_name}.xlsx'))
             # 将note_list先通过qwenApi处理一遍，提取信息
             processed_note_list = []
             from sql_utils.sql_connector import BasketballCourt, CourtUnit
-            for note in note_list:
-                print("开始使用qwen大模型处理笔记信息...")
-                processed_note = self.qwen_client.extract_xhs_info(note)
+            if self.relevance_filter is not None:
+                note_list, dropped_notes = self.relevance_filter.split(note_list)
+                for note in dropped_notes:
+                    logger.info(f'笔记与球场无关，跳过大模型提取 {note.get("note_url", "")}: {note.get("title", "")}')
+                    if note['note_id'] not in failed_notes:
+                        self.mark_note_done(note)
+                logger.info(f'相关性过滤: 保留 {len(note_list)} 篇, 跳过 {len(dropped_notes)} 篇, 累计 {self.relevance_filter.stats()}')
+            court_index = self.court_index(province, city, state)
+            print("开始使用qwen大模型处理笔记信息...")
+            # 按完成顺序处理，先返回的笔记先入库
+            for note, processed_note in self.qwen_client.iter_extract_xhs_info(note_list, self.llm_workers, self.llm_batch_tokens):
                 print("处理结果为:")
                 print(processed_note)
                 note_url = note.get('url', '')
@@ -80,6 +202,9 @@ class Data_Spider():
                     if not isinstance(processed_note_json, list):
                         logger.error(f'处理笔记时返回结果不是列表: {processed_note}')
                         continue
+                    # 已有的球场合并字段，新球场插入，每个球场一个事务
+                    note_items = []
+                    note_court_dicts = []
                     # 遍历processed_note_json, 跳过success为False的项
                     for item in processed_note_json:
                         if not item.get('success', False):
@@ -102,16 +227,24 @@ class Data_Spider():
                         # 构造BasketballCourt对象
                         court_obj = BasketballCourt(**{k: v for k, v in bc_dict.items() if k in BasketballCourt.__dataclass_fields__})
                         print(court_obj)
-                        court_id = self._sql_conn.insert_basketball_court(court_obj)
-                        # 插入所有CourtUnit
-                        for cu in cu_list:
-                            cu['court_id'] = court_id
-                            unit_obj = CourtUnit(**{k: v for k, v in cu.items() if k in CourtUnit.__dataclass_fields__})
+                        # 构造所有CourtUnit，court_id 在插入时设置
+                        unit_objs = [CourtUnit(**{k: v for k, v in cu.items() if k in CourtUnit.__dataclass_fields__ and k != 'court_id'}) for cu in cu_list]
+                        for unit_obj in unit_objs:
                             print(unit_obj)
-                            self._sql_conn.insert_court_unit(unit_obj)
+                        note_items.append((court_obj, unit_objs))
+                        note_court_dicts.append(bc_dict)
+                    for (court_obj, unit_objs), bc_dict in zip(note_items, note_court_dicts):
+                        # 名称不完全相同的同一球场也合并到已有记录
+                        court_id = court_index.get(court_obj.name, court_obj.latitude, court_obj.longtitude)
+                        court_id, created = self._sql_conn.upsert_court_with_units(court_obj, unit_objs, court_id)
+                        court_index.add(court_obj.name, court_id, court_obj.latitude, court_obj.longtitude)
+                        logger.info(f'{"新增" if created else "合并"}球场 {court_obj.name} (ID: {court_id})')
                         # 也可加入excel导出
                         bc_dict['id'] = court_id
                         processed_note_list.append(bc_dict)
+                    # 提取和入库都完成后才记录到笔记索引，失败的笔记下次重新处理
+                    if note['note_id'] not in failed_notes:
+                        self.mark_note_done(note)
                 except json.JSONDecodeError:
                     logger.error(f'处理笔记时发生错误: {processed_note}')
                     continue
@@ -158,21 +291,19 @@ class Data_Spider():
             返回搜索的结果
         """
         note_list = []
-        # try:
-        success, msg, notes = self.xhs_apis.search_some_note(query, require_num, cookies_str, sort_type_choice, note_type, note_time, note_range, pos_distance, geo, proxies)
-        if success:
-            notes = list(filter(lambda x: x['model_type'] == "note", notes))
-            logger.info(f'搜索关键词 {query} 笔记数量: {len(notes)}')
-            for note in notes:
-                note_url = f"https://www.xiaohongshu.com/explore/{note['id']}?xsec_token={note['xsec_token']}"
-                note_list.append(note_url)
         if save_choice == 'all' or save_choice == 'excel':
             excel_name = query
-        self.spider_some_note(province, city, state, note_list, cookies_str, base_path, save_choice, excel_name, proxies)
-        # except Exception as e:
-        #     success = False
-        #     msg = e
-        # logger.info(f'搜索关键词 {query} 笔记: {success}, msg: {msg}')
+        success, msg = True, 'success'
+        try:
+            # 每页处理完再取下一页，开启断点续爬时断点只会越过已经处理过的页
+            for notes in self.xhs_apis.iter_search_some_note(query, require_num, cookies_str, sort_type_choice, note_type, note_time, note_range, pos_distance, geo, proxies, by_page=True):
+                page_note_list = [f"https://www.xiaohongshu.com/explore/{note['id']}?xsec_token={note['xsec_token']}" for note in notes if note['model_type'] == "note"]
+                self.spider_some_note(province, city, state, page_note_list, cookies_str, base_path, save_choice, excel_name, proxies)
+                note_list.extend(page_note_list)
+        except Exception as e:
+            success = False
+            msg = str(e)
+        logger.info(f'搜索关键词 {query} 笔记数量: {len(note_list)}, 成功: {success}, msg: {msg}')
         return note_list, success, msg
     
     def iter_districts_and_counties(self):
@@ -275,7 +406,11 @@ def fetch_courts_by_qwen(data_spider, province: str, city: str, state: str, quer
     print(f"[Qwen模式] 正在通过Qwen联网搜索...")
     
     from sql_utils.sql_connector import BasketballCourt, CourtUnit
-    
+
+    # 一次载入该区县已有的球场用于查重，插入后同步更新
+    court_index = data_spider.court_index(province, city, state)
+    print(f"[Qwen模式] 已载入 {len(court_index)} 个已有球场")
+
     # 使用生成器逐个处理球场信息
     courts_generator = data_spider.qwen_client.search_and_summarize_courts(
         province=province,
@@ -305,36 +440,25 @@ def fetch_courts_by_qwen(data_spider, province: str, city: str, state: str, quer
             bc_dict['city'] = city
             bc_dict['district'] = state
             
-            # 先查询该球场是否已存在
+            unit_objs = [CourtUnit(**{k: v for k, v in cu.items() if k in CourtUnit.__dataclass_fields__ and k != 'court_id'}) for cu in cu_list]
+
+            # 先在索引中查询该球场是否已存在
             court_name = bc_dict.get('name', '')
-            existing_court = data_spider._sql_conn.get_basketball_court_by_location(
-                name=court_name,
-                province=province,
-                city=city,
-                district=state
-            )
-            
-            if existing_court:
-                # 球场已存在，跳过插入
-                print(f"  ⏭️ 球场已存在: {court_name} (ID: {existing_court.id})，跳过插入")
-                court_id = existing_court.id
-            else:
-                # 球场不存在，执行插入
-                # 构造BasketballCourt对象
-                court_obj = BasketballCourt(**{k: v for k, v in bc_dict.items() if k in BasketballCourt.__dataclass_fields__})
-                
-                # 插入篮球场到数据库
-                court_id = data_spider._sql_conn.insert_basketball_court(court_obj)
+            court_id = court_index.get(court_name, bc_dict.get('latitude'), bc_dict.get('longtitude'))
+
+            # 已有的球场（包括模糊匹配到的）合并字段和单元，单元按名称/类型匹配，不重复插入；新球场和单元一起插入
+            court_obj = BasketballCourt(**{k: v for k, v in bc_dict.items() if k in BasketballCourt.__dataclass_fields__})
+            court_id, created = data_spider._sql_conn.upsert_court_with_units(court_obj, unit_objs, court_id)
+            court_index.add(court_name, court_id, court_obj.latitude, court_obj.longtitude)
+            if created:
                 print(f"  ✅ 已插入球场: {court_obj.name} (ID: {court_id})")
                 total_courts += 1
-            
-            # 插入该球场的所有单元
-            for cu in cu_list:
-                cu['court_id'] = court_id
-                unit_obj = CourtUnit(**{k: v for k, v in cu.items() if k in CourtUnit.__dataclass_fields__})
-                data_spider._sql_conn.insert_court_unit(unit_obj)
+            else:
+                print(f"  🔀 球场已存在，已合并: {court_name} (ID: {court_id})")
+
+            for unit_obj in unit_objs:
                 total_units += 1
-                print(f"    └─ 已插入单元: {unit_obj.unit_name} (court_id: {court_id})")
+                print(f"    └─ 已写入单元: {unit_obj.unit_name} (court_id: {court_id})")
             
             # 保存原始数据用于Excel导出
             bc_dict['id'] = court_id
@@ -348,7 +472,7 @@ def fetch_courts_by_qwen(data_spider, province: str, city: str, state: str, quer
     
     print(f"\n[Qwen模式] 搜索和插入完成！")
     print(f"  总计插入球场: {total_courts} 个")
-    print(f"  总计插入单元: {total_units} 个")
+    print(f"  总计写入单元: {total_units} 个")
     
     # 将Qwen搜索结果保存为Excel
     if all_courts_data:
@@ -391,11 +515,35 @@ if __name__ == '__main__':
         parser.add_argument('--district', type=str, default='临平区', help='区县名称')
         parser.add_argument('--province', type=str, default='浙江省', help='省份名称')
         parser.add_argument('--count', type=int, default=50, help='XHS模式下的搜索数量')
+        parser.add_argument('--workers', type=int, default=4, help='XHS模式下并发爬取笔记的线程数')
+        parser.add_argument('--rate', type=float, default=5, help='XHS模式下每个host每秒的最大请求数，0为不限速')
+        parser.add_argument('--resume', action='store_true', help='XHS模式下翻页中断后从断点继续，只获取缺失的部分')
+        parser.add_argument('--incremental', action='store_true', help='XHS模式下跳过之前爬取过且没有变化的笔记')
+        parser.add_argument('--cache', action='store_true', help='XHS模式下缓存接口结果，开发调试时重复运行不再重复请求')
+        parser.add_argument('--no-llm-cache', action='store_true', help='XHS模式下不使用大模型提取结果的缓存')
+        parser.add_argument('--llm-workers', type=int, default=4, help='XHS模式下同时调用大模型提取笔记信息的数量')
+        parser.add_argument('--rpm', type=int, default=0, help='大模型每分钟最大请求数，0为不限制')
+        parser.add_argument('--tpm', type=int, default=0, help='大模型每分钟最大token数，0为不限制')
+        parser.add_argument('--llm-batch-tokens', type=int, default=0, help='XHS模式下多篇笔记合并为一次大模型请求的估算token上限，0为逐篇请求')
+        parser.add_argument('--relevance-threshold', type=float, default=2, help='XHS模式下大模型提取前相关性打分的阈值，低于阈值的笔记跳过')
+        parser.add_argument('--no-relevance-filter', action='store_true', help='XHS模式下不做相关性过滤，所有笔记都交给大模型')
+        parser.add_argument('--download-workers', type=int, default=None, help='XHS模式下所有笔记共用的同时下载连接数')
         
         args = parser.parse_args()
         
         cookies_str, base_path = init()
-        data_spider = Data_Spider()  
+        data_spider = Data_Spider(
+            args.workers, args.rate, args.resume,
+            download_workers=args.download_workers,
+            incremental=args.incremental,
+            cache=args.cache,
+            llm_cache=not args.no_llm_cache,
+            llm_workers=args.llm_workers,
+            rpm=args.rpm,
+            tpm=args.tpm,
+            llm_batch_tokens=args.llm_batch_tokens,
+            relevance_threshold=None if args.no_relevance_filter else args.relevance_threshold,
+        )
         
         province = args.province
         city = args.city
@@ -411,6 +559,7 @@ if __name__ == '__main__':
             print(f"\n========== Qwen联网搜索模式 ==========")
             fetch_courts_by_qwen(data_spider, province, city, district)
         
+        logger.info(f'大模型调用统计: {data_spider.qwen_client.call_stats()}')
         data_spider.close()
         print(f"\n程序执行完成！")
         
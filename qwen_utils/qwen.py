@@ -1,15 +1,298 @@
+import hashlib
+import json
 import os
-from openai import OpenAI
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from loguru import logger
+from openai import OpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+# 提取小红书笔记中篮球场信息的提示词，笔记内容拼接在最后
+extract_xhs_prompt = (
+    "# 职责\n"
+    "你是一个数据信息提取员，你的职责是从输入的内容中提取、整理出与篮球场地相关的所有结构化信息。\n"
+    "请根据下方的字段定义，提取出每个球场（BasketballCourt）及其包含的所有单元（CourtUnit）的信息。\n"
+    "输出内容必须严格按照给定的json格式，字段名和类型必须与定义完全一致，未获取到的字段请置为null或空字符串。\n\n"
+    "# BasketballCourt 字段定义（每个字段后有详细描述）\n"
+    "{\n"
+    "  id: int, // 主键，自增\n"
+    "  name: str, // 场地名称\n"
+    "  description: str, // 场地描述\n"
+    "  operator: str, // 管理/运营单位（如市政、公园）\n"
+    "  is_free: int, // 是否免费开放\n"
+    "  access_type: str, // 访问类型，open/gated/appointment/restricted\n"
+    "  province: str, // 省份\n"
+    "  city: str, // 城市\n"
+    "  district: str, // 区/县\n"
+    "  address: str, // 地址\n"
+    "  place_id: str, // 由第三方提供的场地id\n"
+    "  latitude: float, // 纬度（十进制度）\n"
+    "  longtitude: float, // 经度（十进制度）\n"
+    "  nearest_transit: str, // 公共交通描述\n"
+    "  has_parking: int, // 是否可以停车\n"
+    "  free_parking: int, // 停车是否免费\n"
+    "  parking_type: str, // 停车类型，on_street/lot/garage/none\n"
+    "  parking_fee_info: str, // 停车收费说明（文本）\n"
+    "  parking_capacity: int, // 预估车位数\n"
+    "  has_lights: int, // 是否有夜间照明\n"
+    "  light_type: str, // 灯光类型（flood/pole/led/none）\n"
+    "  light_hours_desc: str, // 灯光启用时段说明\n"
+    "  surface_type: str, // 地面材质\n"
+    "  surface_notes: str, // 地面情况备注，如破损、坑洼等\n"
+    "  total_units_count: int, // 全场个数（不算单独半场）\n"
+    "  half_units_count: int, // 半场个数（不算全场）\n"
+    "  week_open_hours: str, // 每周开门时间统计\n"
+    "  free_open_hours: str, // 每周免费时间统计\n"
+    "  week_appointment_hours: str, // 每周需预约的时间统计\n"
+    "  appointment_type_desc: str, // 预约方式描述\n"
+    "  amenities_summary: str, // 其他基础设施如WC、洗手池、饮水机等统计\n"
+    "  gmt_create: str, // 创建时间\n"
+    "  creator: str, // 创建人\n"
+    "  creator_id: str, // 创建人id\n"
+    "  gmt_modified: str, // 修改时间\n"
+    "  modifier_id: str, // 修改人id\n"
+    "  modifier: str // 修改人\n"
+    "}\n\n"
+    "# CourtUnit 字段定义（每个字段后有详细描述）\n"
+    "{\n"
+    "  id: int, // 主键，自增\n"
+    "  court_id: int, // 外键，篮球场id\n"
+    "  unit_name: str, // 单元名称或编号，如A场\n"
+    "  unit_type: str, // 单元类型（full/half/3x3/multi）\n"
+    "  length_m: int, // 长度\n"
+    "  width_m: int, // 宽度\n"
+    "  is_standard: int, // 是否为标准场地\n"
+    "  fenced: int, // 是否有围栏\n"
+    "  lines_painted: int, // 球线是否清晰可见\n"
+    "  surface_condition_score: int, // 场地综合评分，100分满分\n"
+    "  hoop_brand: str, // 篮筐/篮板品牌（文本）\n"
+    "  hoop_material: str, // 篮板材质\n"
+    "  rim_type: str, // 篮筐类型（breakaway/fixed/none）\n"
+    "  rim_height_cm: int, // 篮筐高度，厘米制\n"
+    "  is_standard_rim: int, // 是否为标准篮筐\n"
+    "  unit_status: str, // 单元状态（损坏、临时封闭等）\n"
+    "  gmt_create: str, // 创建时间\n"
+    "  gmt_modified: str, // 修改时间\n"
+    "  modifier_id: str, // 修改人id\n"
+    "  modifier: str, // 修改人\n"
+    "  creator_id: str, // 创建人id\n"
+    "  creator: str, // 创建人\n"
+    "  surface_type: str, // 场地地面材质\n"
+    "  surface_status: str // 场地地面状态，破损、坑洼等等\n"
+    "}\n\n"
+    "# 输出格式\n"
+    "[\n"
+    "  {\n"
+    "    'success': 该场地的提取是否成功，true/false,\n"
+    "    'basketball_court': {BasketballCourt字段...},\n"
+    "    'court_units': [ {CourtUnit字段...}, ... ]\n"
+    "  }, ...\n"
+    "]\n\n"
+    "# 要求\n"
+    "1. 只输出上述json格式，不要输出多余内容。\n"
+    "2. 字段名、类型、结构必须与定义完全一致。\n"
+    "3. 一个输入可能包含多个球场，每个球场下可有多个单元。如果无法从描述中区分出球场有几块场地，默认按照一个全场来算。\n"
+    "4. 未获取到的字段请置为空字符串。\n"
+    "5. 不要自行编造信息。\n"
+    "# 输入内容\n"
+)
+# 一次请求提取多篇笔记的提示词，字段定义只发送一次
+extract_xhs_batch_prompt = extract_xhs_prompt.replace(
+    "# 输入内容\n",
+    "# 批量输入\n"
+    "输入内容包含多篇笔记，每篇笔记以 '## 笔记 编号' 开头，请分别提取每篇笔记。\n"
+    "输出一个json对象，键为笔记编号（字符串），值为该笔记按上述输出格式得到的数组，例如 {\"0\": [...], \"1\": [...]}。\n"
+    "每个编号都必须输出，没有球场信息的笔记对应空数组，不同笔记的信息不要混在一起。\n\n"
+    "# 输入内容\n"
+)
+# 提示词修改后版本随之变化，之前缓存的结果不再使用
+extract_xhs_prompt_version = hashlib.sha256(extract_xhs_prompt.encode('utf-8')).hexdigest()[:16]
+extract_xhs_batch_prompt_version = hashlib.sha256(extract_xhs_batch_prompt.encode('utf-8')).hexdigest()[:16]
+# 笔记中与篮球场信息相关的字段，互动数量、url等每次获取都会变化的字段不传给模型
+note_text_fields = ('title', 'desc', 'tags', 'note_type', 'upload_time', 'ip_location')
+
+
+def note_text(note):
+    if isinstance(note, dict):
+        return json.dumps({field: note.get(field) for field in note_text_fields}, ensure_ascii=False)
+    return note
+
+
+def pack_notes(notes: list, max_tokens: int, max_notes: int = 8):
+    """
+        按估算的token数（笔记文本长度）把笔记分批，每批不超过 max_tokens 和 max_notes
+        单篇超过 max_tokens 的笔记单独一批
+    """
+    batch = []
+    tokens = 0
+    for note in notes:
+        size = len(note_text(note))
+        if batch and (tokens + size > max_tokens or len(batch) >= max_notes):
+            yield batch
+            batch = []
+            tokens = 0
+        batch.append(note)
+        tokens += size
+    if batch:
+        yield batch
+
+
+class JsonArrayParser():
+    """
+        增量解析流式输出中的json数组，数组中的一个元素完整后立即返回
+        数组可以在最外层，也可以是最外层对象中的第一个数组，例如 {"courts": [...]}
+        无法解析的元素记录日志后跳过
+    """
+    def __init__(self):
+        self._buffer = []
+        self._collecting = False
+        self._depth = 0
+        self._array_depth = None
+        self._in_string = False
+        self._escape = False
+        self.done = False
+
+    def _flush(self, items: list):
+        text = ''.join(self._buffer).strip()
+        self._buffer = []
+        self._collecting = False
+        if not text:
+            return
+        try:
+            items.append(json.loads(text))
+        except ValueError:
+            logger.warning(f'无法解析的数组元素: {text[:200]}')
+
+    def feed(self, text: str):
+        """
+            传入新收到的文本，返回本次完整的元素列表
+        """
+        items = []
+        for char in text:
+            if self.done:
+                break
+            if self._in_string:
+                if self._collecting:
+                    self._buffer.append(char)
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            at_element = self._array_depth is not None and self._depth == self._array_depth
+            if char == '"':
+                self._in_string = True
+                self._collecting = self._collecting or at_element
+            elif char in '[{':
+                if self._array_depth is None and char == '[':
+                    self._depth += 1
+                    self._array_depth = self._depth
+                    continue
+                self._collecting = self._collecting or at_element
+                self._depth += 1
+            elif char in ']}':
+                self._depth -= 1
+                if self._array_depth is not None and self._depth < self._array_depth:
+                    # 数组结束
+                    self._flush(items)
+                    self.done = True
+                    continue
+                if self._collecting and self._depth == self._array_depth:
+                    self._buffer.append(char)
+                    self._flush(items)
+                    continue
+            elif char == ',' and at_element:
+                self._flush(items)
+                continue
+            elif at_element and not self._collecting and not char.isspace():
+                self._collecting = True
+            if self._collecting:
+                self._buffer.append(char)
+        return items
+
+
+class QwenRateLimiter():
+    """
+        按最近60秒的滑动窗口限制每分钟请求数和token数，为0时不限制
+        请求前按提示词长度估算token数
+        :param rpm: 每分钟最大请求数
+        :param tpm: 每分钟最大token数
+    """
+    def __init__(self, rpm: int = 0, tpm: int = 0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._window = deque()
+        self._tokens = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 0):
+        if self.rpm <= 0 and self.tpm <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._window and now - self._window[0][0] >= 60:
+                    self._tokens -= self._window.popleft()[1]
+                rpm_ok = self.rpm <= 0 or len(self._window) < self.rpm
+                # 单个请求超过tpm时，窗口清空后放行
+                tpm_ok = self.tpm <= 0 or not self._window or self._tokens + tokens <= self.tpm
+                if rpm_ok and tpm_ok:
+                    self._window.append((now, tokens))
+                    self._tokens += tokens
+                    return
+                wait = 60 - (now - self._window[0][0])
+            time.sleep(max(wait, 0.01))
+
 
 class QwenClient:
-    def __init__(self, model):
+    # 可以重试的临时错误
+    retry_errors = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+    def __init__(self, model, cache=None, rpm: int = 0, tpm: int = 0, retries: int = 3, backoff_factor: float = 1):
+        """
+        :param model: 模型名称
+        :param cache: LlmCache，传入后缓存 extract_xhs_info 的结果
+        :param rpm: 每分钟最大请求数，0为不限制
+        :param tpm: 每分钟最大token数，0为不限制
+        :param retries: invoke 遇到连接错误、超时、限流、5xx时的重试次数
+        :param backoff_factor: 第n次重试等待 backoff_factor * 2^(n-1) 秒
+        """
         self.model = model
+        self.cache = cache
+        self.limiter = QwenRateLimiter(rpm, tpm)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        # 最近的调用耗时和token数，见 call_stats
+        self.calls = deque(maxlen=1000)
+        self._calls_lock = threading.Lock()
         self.client = OpenAI(
             api_key=os.getenv("DASHSCOPE_API_KEY"),
             base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
         )
 
     def invoke(self, message):
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire(len(message))
+            try:
+                return self._invoke(message)
+            except self.retry_errors as e:
+                if attempt == self.retries:
+                    raise
+                wait = self.backoff_factor * 2 ** attempt
+                logger.warning(f'调用{self.model}失败，{wait}秒后重试: {e}')
+                time.sleep(wait)
+
+    def _invoke(self, message):
+        return ''.join(self.invoke_stream(message))
+
+    def invoke_stream(self, message):
+        """
+            流式调用，逐段 yield 模型输出，不做重试
+        """
+        start = time.perf_counter()
         completion = self.client.chat.completions.create(
             model=self.model,
             messages=[
@@ -20,13 +303,10 @@ class QwenClient:
             response_format={"type": "json_object"},
             stream_options={"include_usage": True}
         )
-        result = ""
-        for chunk in completion:
-            if hasattr(chunk, "choices") and chunk.choices and len(chunk.choices) > 0 and hasattr(chunk.choices[0].delta, "content") and chunk.choices[0].delta.content:
-                result += chunk.choices[0].delta.content
-        return result
-    
+        yield from self._iter_content(completion, start)
+
     def invoke_with_network_search(self, message):
+        start = time.perf_counter()
         completion = self.client.chat.completions.create(
             model=self.model,
             messages=[
@@ -40,11 +320,56 @@ class QwenClient:
                 "enable_search": True
             }
         )
-        result = ""
-        for chunk in completion:
-            if hasattr(chunk, "choices") and chunk.choices and len(chunk.choices) > 0 and hasattr(chunk.choices[0].delta, "content") and chunk.choices[0].delta.content:
-                result += chunk.choices[0].delta.content
-        return result
+        return ''.join(self._iter_content(completion, start))
+
+    def _iter_content(self, completion, start: float):
+        """
+            逐段 yield 流式输出的内容，结束后记录首个token耗时、总耗时和token数
+        """
+        call = {'model': self.model, 'ttft': None, 'total': None, 'chunks': 0,
+                'prompt_tokens': None, 'completion_tokens': None, 'total_tokens': None}
+        try:
+            for chunk in completion:
+                usage = getattr(chunk, "usage", None)
+                if usage:
+                    call['prompt_tokens'] = usage.prompt_tokens
+                    call['completion_tokens'] = usage.completion_tokens
+                    call['total_tokens'] = usage.total_tokens
+                if hasattr(chunk, "choices") and chunk.choices and len(chunk.choices) > 0 and hasattr(chunk.choices[0].delta, "content") and chunk.choices[0].delta.content:
+                    if call['ttft'] is None:
+                        call['ttft'] = time.perf_counter() - start
+                    call['chunks'] += 1
+                    yield chunk.choices[0].delta.content
+        finally:
+            call['total'] = time.perf_counter() - start
+            with self._calls_lock:
+                self.calls.append(call)
+            logger.debug(f'调用{self.model}: 首token {call["ttft"] or 0:.2f}s, 总耗时 {call["total"]:.2f}s, token {call["total_tokens"]}')
+
+    def call_stats(self):
+        """
+            返回最近调用的统计: 次数、平均/p95首token耗时、平均/p95总耗时、token总数
+        """
+        with self._calls_lock:
+            calls = list(self.calls)
+
+        def percentile(values, p):
+            if not values:
+                return None
+            values = sorted(values)
+            return values[min(len(values) - 1, int(len(values) * p))]
+
+        ttfts = [call['ttft'] for call in calls if call['ttft'] is not None]
+        totals = [call['total'] for call in calls]
+        return {
+            'calls': len(calls),
+            'ttft_avg': sum(ttfts) / len(ttfts) if ttfts else None,
+            'ttft_p95': percentile(ttfts, 0.95),
+            'total_avg': sum(totals) / len(totals) if totals else None,
+            'total_p95': percentile(totals, 0.95),
+            'prompt_tokens': sum(call['prompt_tokens'] or 0 for call in calls),
+            'completion_tokens': sum(call['completion_tokens'] or 0 for call in calls),
+        }
     
     # 通过联网搜索获取多条篮球场信息，支持多轮对话，使用yield逐个返回
     def search_and_summarize_courts(self, province: str, city: str, district: str, query: str = ""):
@@ -150,6 +475,7 @@ class QwenClient:
         
         while True:
             # 进行API调用
+            start = time.perf_counter()
             completion = self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
@@ -160,41 +486,30 @@ class QwenClient:
                     "enable_search": True
                 }
             )
-            
-            result = ""
-            for chunk in completion:
-                if hasattr(chunk, "choices") and chunk.choices and len(chunk.choices) > 0 and hasattr(chunk.choices[0].delta, "content") and chunk.choices[0].delta.content:
-                    result += chunk.choices[0].delta.content
-            
+
+            print(f"\n📍 第 {round_num} 轮搜索结果:")
+            # 边接收边解析，数组中的球场完整后立即返回，不等整个回复结束
+            parser = JsonArrayParser()
+            parts = []
+            courts = []
+            for content in self._iter_content(completion, start):
+                parts.append(content)
+                for court in parser.feed(content):
+                    if not isinstance(court, dict):
+                        continue
+                    courts.append(court)
+                    total_count += 1
+                    print(f"  [{total_count}] 返回球场: {court.get('basketball_court', {}).get('name', 'N/A')}")
+                    yield court
+            result = ''.join(parts)
+            print(f"✅ 本轮获取到 {len(courts)} 条球场信息")
+
             # 检查是否返回"没有了"
             if "没有了" in result:
                 print(f"\n✅ 搜索完成！Qwen回复：没有了")
                 print(f"总计获取 {total_count} 条球场信息\n")
                 break
-            
-            # 尝试解析JSON结果
-            courts = []
-            try:
-                import json
-                # 尝试提取JSON部分
-                json_start = result.find('[')
-                json_end = result.rfind(']') + 1
-                if json_start != -1 and json_end > json_start:
-                    json_str = result[json_start:json_end]
-                    courts = json.loads(json_str)
-            except json.JSONDecodeError:
-                # 如果解析失败，跳过此轮
-                pass
-            
-            print(f"\n📍 第 {round_num} 轮搜索结果:")
-            print(f"✅ 本轮获取到 {len(courts)} 条球场信息")
-            
-            # 逐个yield返回球场信息
-            for court in courts:
-                total_count += 1
-                print(f"  [{total_count}] 返回球场: {court.get('basketball_court', {}).get('name', 'N/A')}")
-                yield court
-            
+
             print(f"累计已返回 {total_count} 条球场信息")
             print("正在准备下一轮搜索...\n")
             
@@ -211,94 +526,86 @@ class QwenClient:
 
     # 提取小红书文本中的篮球场及单元信息，字段严格对应BasketballCourt和CourtUnit
     def extract_xhs_info(self, text):
-        prompt = (
-            "# 职责\n"
-            "你是一个数据信息提取员，你的职责是从输入的内容中提取、整理出与篮球场地相关的所有结构化信息。\n"
-            "请根据下方的字段定义，提取出每个球场（BasketballCourt）及其包含的所有单元（CourtUnit）的信息。\n"
-            "输出内容必须严格按照给定的json格式，字段名和类型必须与定义完全一致，未获取到的字段请置为null或空字符串。\n\n"
-            "# BasketballCourt 字段定义（每个字段后有详细描述）\n"
-            "{\n"
-            "  id: int, // 主键，自增\n"
-            "  name: str, // 场地名称\n"
-            "  description: str, // 场地描述\n"
-            "  operator: str, // 管理/运营单位（如市政、公园）\n"
-            "  is_free: int, // 是否免费开放\n"
-            "  access_type: str, // 访问类型，open/gated/appointment/restricted\n"
-            "  province: str, // 省份\n"
-            "  city: str, // 城市\n"
-            "  district: str, // 区/县\n"
-            "  address: str, // 地址\n"
-            "  place_id: str, // 由第三方提供的场地id\n"
-            "  latitude: float, // 纬度（十进制度）\n"
-            "  longtitude: float, // 经度（十进制度）\n"
-            "  nearest_transit: str, // 公共交通描述\n"
-            "  has_parking: int, // 是否可以停车\n"
-            "  free_parking: int, // 停车是否免费\n"
-            "  parking_type: str, // 停车类型，on_street/lot/garage/none\n"
-            "  parking_fee_info: str, // 停车收费说明（文本）\n"
-            "  parking_capacity: int, // 预估车位数\n"
-            "  has_lights: int, // 是否有夜间照明\n"
-            "  light_type: str, // 灯光类型（flood/pole/led/none）\n"
-            "  light_hours_desc: str, // 灯光启用时段说明\n"
-            "  surface_type: str, // 地面材质\n"
-            "  surface_notes: str, // 地面情况备注，如破损、坑洼等\n"
-            "  total_units_count: int, // 全场个数（不算单独半场）\n"
-            "  half_units_count: int, // 半场个数（不算全场）\n"
-            "  week_open_hours: str, // 每周开门时间统计\n"
-            "  free_open_hours: str, // 每周免费时间统计\n"
-            "  week_appointment_hours: str, // 每周需预约的时间统计\n"
-            "  appointment_type_desc: str, // 预约方式描述\n"
-            "  amenities_summary: str, // 其他基础设施如WC、洗手池、饮水机等统计\n"
-            "  gmt_create: str, // 创建时间\n"
-            "  creator: str, // 创建人\n"
-            "  creator_id: str, // 创建人id\n"
-            "  gmt_modified: str, // 修改时间\n"
-            "  modifier_id: str, // 修改人id\n"
-            "  modifier: str // 修改人\n"
-            "}\n\n"
-            "# CourtUnit 字段定义（每个字段后有详细描述）\n"
-            "{\n"
-            "  id: int, // 主键，自增\n"
-            "  court_id: int, // 外键，篮球场id\n"
-            "  unit_name: str, // 单元名称或编号，如A场\n"
-            "  unit_type: str, // 单元类型（full/half/3x3/multi）\n"
-            "  length_m: int, // 长度\n"
-            "  width_m: int, // 宽度\n"
-            "  is_standard: int, // 是否为标准场地\n"
-            "  fenced: int, // 是否有围栏\n"
-            "  lines_painted: int, // 球线是否清晰可见\n"
-            "  surface_condition_score: int, // 场地综合评分，100分满分\n"
-            "  hoop_brand: str, // 篮筐/篮板品牌（文本）\n"
-            "  hoop_material: str, // 篮板材质\n"
-            "  rim_type: str, // 篮筐类型（breakaway/fixed/none）\n"
-            "  rim_height_cm: int, // 篮筐高度，厘米制\n"
-            "  is_standard_rim: int, // 是否为标准篮筐\n"
-            "  unit_status: str, // 单元状态（损坏、临时封闭等）\n"
-            "  gmt_create: str, // 创建时间\n"
-            "  gmt_modified: str, // 修改时间\n"
-            "  modifier_id: str, // 修改人id\n"
-            "  modifier: str, // 修改人\n"
-            "  creator_id: str, // 创建人id\n"
-            "  creator: str, // 创建人\n"
-            "  surface_type: str, // 场地地面材质\n"
-            "  surface_status: str // 场地地面状态，破损、坑洼等等\n"
-            "}\n\n"
-            "# 输出格式\n"
-            "[\n"
-            "  {\n"
-            "    'success': 该场地的提取是否成功，true/false,\n"
-            "    'basketball_court': {BasketballCourt字段...},\n"
-            "    'court_units': [ {CourtUnit字段...}, ... ]\n"
-            "  }, ...\n"
-            "]\n\n"
-            "# 要求\n"
-            "1. 只输出上述json格式，不要输出多余内容。\n"
-            "2. 字段名、类型、结构必须与定义完全一致。\n"
-            "3. 一个输入可能包含多个球场，每个球场下可有多个单元。如果无法从描述中区分出球场有几块场地，默认按照一个全场来算。\n"
-            "4. 未获取到的字段请置为空字符串。\n"
-            "5. 不要自行编造信息。\n"
-            "# 输入内容\n"
-            f"{text}\n"
-        )
+        """
+        :param text: 笔记文本，传入 handle_note_info 返回的笔记时只取其中的内容字段
+        返回模型输出的json字符串，开启缓存时相同模型、相同提示词版本、相同笔记内容直接返回缓存
+        """
+        text = note_text(text)
+        if self.cache is not None:
+            response = self.cache.get(self.model, extract_xhs_prompt_version, text)
+            if response is not None:
+                return response
+        prompt = extract_xhs_prompt + f"{text}\n"
         response = self.invoke(prompt)
-        return response
\ No newline at end of file
+        if self.cache is not None:
+            self.cache.save(self.model, extract_xhs_prompt_version, text, response)
+        return response
+
+    def extract_xhs_info_batch(self, notes: list):
+        """
+            一次请求提取多篇笔记，返回与 notes 一一对应的模型输出
+            缓存中已有的笔记不再发送，结果缺失或无法解析的笔记退回单篇提取，单篇提取也失败的笔记对应None
+        """
+        texts = [note_text(note) for note in notes]
+        responses = [None] * len(notes)
+        if self.cache is not None:
+            for index, text in enumerate(texts):
+                # 单篇和批量提取的输出格式相同，两者的缓存都可以使用
+                responses[index] = self.cache.get(self.model, extract_xhs_prompt_version, text) or self.cache.get(self.model, extract_xhs_batch_prompt_version, text)
+        pending = [index for index, response in enumerate(responses) if response is None]
+        if len(pending) > 1:
+            prompt = extract_xhs_batch_prompt + ''.join(f"## 笔记 {index}\n{texts[index]}\n\n" for index in pending)
+            try:
+                result = json.loads(self.invoke(prompt))
+            except Exception as e:
+                logger.warning(f'批量提取{len(pending)}篇笔记失败，改为逐篇提取: {e}')
+                result = {}
+            for index in pending:
+                items = result.get(str(index)) if isinstance(result, dict) else None
+                if isinstance(items, list):
+                    responses[index] = json.dumps(items, ensure_ascii=False)
+                    if self.cache is not None:
+                        self.cache.save(self.model, extract_xhs_batch_prompt_version, texts[index], responses[index])
+        for index, response in enumerate(responses):
+            if response is None:
+                try:
+                    responses[index] = self.extract_xhs_info(notes[index])
+                except Exception as e:
+                    logger.error(f'提取笔记信息失败 {notes[index].get("note_url", "") if isinstance(notes[index], dict) else ""}: {e}')
+        return responses
+
+    def iter_extract_xhs_info(self, notes: list, max_workers: int = 4, batch_tokens: int = 0, max_batch_notes: int = 8):
+        """
+            并发提取多篇笔记，按完成顺序 yield (note, 模型输出)
+            重试后仍失败的笔记记录日志后跳过
+            :param max_workers: 同时请求的数量
+            :param batch_tokens: 大于0时把多篇笔记合并为一次请求，每次请求的笔记文本不超过这个估算token数
+            :param max_batch_notes: 每次请求最多合并的笔记数
+        """
+        if batch_tokens > 0:
+            batches = list(pack_notes(notes, batch_tokens, max_batch_notes))
+        else:
+            batches = [[note] for note in notes]
+        executor = ThreadPoolExecutor(max(1, max_workers))
+        futures = {}
+        for batch in batches:
+            if len(batch) == 1:
+                future = executor.submit(lambda note: [self.extract_xhs_info(note)], batch[0])
+            else:
+                future = executor.submit(self.extract_xhs_info_batch, batch)
+            futures[future] = batch
+        try:
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    responses = future.result()
+                except Exception as e:
+                    for note in batch:
+                        logger.error(f'提取笔记信息失败 {note.get("note_url", "") if isinstance(note, dict) else ""}: {e}')
+                    continue
+                # 批量中单篇失败的已记录日志，只返回成功的笔记
+                yield from ((note, response) for note, response in zip(batch, responses) if response is not None)
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
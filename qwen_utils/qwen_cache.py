@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+default_db_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../datas/llm_cache.db'))
+
+
+class LlmCache():
+    """
+        大模型提取结果的缓存，键为 (模型, 提示词版本, 输入文本的hash)
+        只缓存能解析为json的结果，解析失败的结果下次重新请求
+        :param db_path: sqlite文件路径
+    """
+    def __init__(self, db_path: str = default_db_path):
+        self.db_path = db_path
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        if not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_results ("
+            "model TEXT NOT NULL, prompt_version TEXT NOT NULL, text_hash TEXT NOT NULL, "
+            "result TEXT NOT NULL, created_at REAL NOT NULL, "
+            "PRIMARY KEY (model, prompt_version, text_hash))"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def text_hash(text: str):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get(self, model: str, prompt_version: str, text: str):
+        """
+            返回缓存的模型输出，没有时返回None
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT result FROM llm_results WHERE model=? AND prompt_version=? AND text_hash=?",
+                (model, prompt_version, self.text_hash(text))
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def save(self, model: str, prompt_version: str, text: str, result: str):
+        try:
+            json.loads(result)
+        except (TypeError, ValueError):
+            return False
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO llm_results (model, prompt_version, text_hash, result, created_at) VALUES (?, ?, ?, ?, ?)",
+                (model, prompt_version, self.text_hash(text), result, time.time())
+            )
+            self.conn.commit()
+        return True
+
+    def purge(self, model: str, prompt_version: str):
+        """
+            删除该模型其他提示词版本的结果
+        """
+        with self._lock:
+            self.conn.execute("DELETE FROM llm_results WHERE model=? AND prompt_version<>?", (model, prompt_version))
+            self.conn.commit()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,213 @@
+import math
+import re
+import threading
+import zlib
+
+# 球场名称末尾的通用词，比较名称前去掉，只去掉末尾的，名称中间的保留
+generic_name_suffixes = ('室外篮球场', '室内篮球场', '露天篮球场', '免费篮球场', '篮球场地', '篮球馆', '篮球场', '球场', '场地')
+# 其他运动的场地，名称中出现的运动不同时不视为同一球场
+other_sport_words = ('羽毛球', '网球', '足球', '排球', '乒乓球', '台球', '门球', '棒球', '匹克球', '游泳')
+name_noise_re = re.compile(r'[\s\W_]+')
+
+
+def court_key(name: str):
+    # 与MySQL默认排序规则一致，不区分大小写、忽略首尾空格
+    return (name or '').strip().lower()
+
+
+def normalize_court_name(name: str):
+    """
+    去掉空白、标点和末尾的通用词，"XX公园篮球场" 和 "XX公园球场" 都得到 "xx公园"
+    其他运动的场地（如 "羽毛球场"）不去掉，去掉后为空时保留原名称
+    """
+    name = name_noise_re.sub('', (name or '').lower())
+    core = name
+    stripped = True
+    while stripped:
+        stripped = False
+        for suffix in generic_name_suffixes:
+            if not core.endswith(suffix):
+                continue
+            if suffix == '球场' and any(core.endswith(word + '场') for word in other_sport_words):
+                continue
+            core = core[:-len(suffix)]
+            stripped = True
+            break
+    return core or name
+
+
+def court_sports(name: str):
+    """
+    名称中出现的其他运动
+    """
+    return frozenset(word for word in other_sport_words if word in (name or ''))
+
+
+def name_shingles(name: str):
+    """
+    名称的字符二元组集合，单个字时为该字本身
+    """
+    name = normalize_court_name(name)
+    if len(name) < 2:
+        return {name} if name else set()
+    return {name[i:i + 2] for i in range(len(name) - 1)}
+
+
+def jaccard(a: set, b: set):
+    if not a or not b:
+        return 0
+    return len(a & b) / len(a | b)
+
+
+def parse_coordinate(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value else None
+
+
+def distance_m(lat1, lng1, lat2, lng2):
+    # 小范围内用等距矩形近似
+    x = math.radians(lng2 - lng1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return math.sqrt(x * x + y * y) * 6371000
+
+
+class FuzzyCourtIndex:
+    """
+    球场名称的模糊查重索引，名称按字符二元组做 MinHash LSH，只比较同一分桶的候选，不随球场数量线性增长
+    有坐标时同时按网格索引，近处的球场放宽名称相似度要求，远处的同名球场不视为重复
+    名称中的其他运动不同（如羽毛球场和篮球场）时不视为同一球场
+    匹配结果会用于合并数据库中的记录，没有坐标时要求名称几乎相同，"XX公园北区" 不会匹配到 "XX公园"
+    :param name_threshold: 名称相似度（Jaccard）达到该值视为同一球场
+    :param near_name_threshold: 距离在 near_m 以内时名称相似度的要求
+    :param near_m: 视为同一位置的距离(米)
+    :param far_m: 两边都有坐标且距离超过该值时不视为同一球场
+    :param bands: LSH 的分段数，rows 为每段的哈希数，段越多召回越高
+    """
+    grid_size = 0.01
+
+    def __init__(self, name_threshold: float = 0.8, near_name_threshold: float = 0.5, near_m: float = 200, far_m: float = 2000,
+                 bands: int = 16, rows: int = 2):
+        self.name_threshold = name_threshold
+        self.near_name_threshold = near_name_threshold
+        self.near_m = near_m
+        self.far_m = far_m
+        self.bands = bands
+        self.rows = rows
+        # 固定的哈希参数，保证同一名称的签名稳定
+        self._hash_params = [(2 * i + 1) * 2654435761 % (2 ** 32) for i in range(bands * rows)]
+        self._courts = {}
+        self._buckets = {}
+        self._grid = {}
+        self._lock = threading.Lock()
+
+    def _signature(self, shingles: set):
+        hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles]
+        return [min(((h * a) ^ (a >> 7)) % 4294967311 for h in hashes) for a in self._hash_params]
+
+    def _band_keys(self, shingles: set):
+        signature = self._signature(shingles)
+        return [(band, tuple(signature[band * self.rows:(band + 1) * self.rows])) for band in range(self.bands)]
+
+    def _grid_key(self, lat, lng):
+        return int(math.floor(lat / self.grid_size)), int(math.floor(lng / self.grid_size))
+
+    def add(self, court_id, name: str, latitude=None, longtitude=None):
+        """
+        court_id 可以是任意可哈希的值，如数据库id或excel行号
+        """
+        shingles = name_shingles(name)
+        if not shingles:
+            return
+        lat, lng = parse_coordinate(latitude), parse_coordinate(longtitude)
+        with self._lock:
+            # 同一球场可能有多个名称，每个名称单独记录
+            self._courts.setdefault(court_id, []).append((shingles, court_sports(name), lat, lng))
+            for band_key in self._band_keys(shingles):
+                self._buckets.setdefault(band_key, set()).add(court_id)
+            if lat is not None and lng is not None:
+                self._grid.setdefault(self._grid_key(lat, lng), set()).add(court_id)
+
+    def _near_candidates(self, lat, lng):
+        row, col = self._grid_key(lat, lng)
+        candidates = set()
+        for d_row in (-1, 0, 1):
+            for d_col in (-1, 0, 1):
+                candidates |= self._grid.get((row + d_row, col + d_col), set())
+        return candidates
+
+    def find(self, name: str, latitude=None, longtitude=None):
+        """
+        返回最相似的已有球场id，没有足够相似的返回None
+        """
+        shingles = name_shingles(name)
+        if not shingles:
+            return None
+        sports = court_sports(name)
+        lat, lng = parse_coordinate(latitude), parse_coordinate(longtitude)
+        with self._lock:
+            candidates = set()
+            for band_key in self._band_keys(shingles):
+                candidates |= self._buckets.get(band_key, set())
+            if lat is not None and lng is not None:
+                candidates |= self._near_candidates(lat, lng)
+            best_id, best_score = None, 0
+            for court_id in candidates:
+                for court_shingles, entry_sports, court_lat, court_lng in self._courts[court_id]:
+                    if entry_sports != sports:
+                        continue
+                    score = jaccard(shingles, court_shingles)
+                    threshold = self.name_threshold
+                    if None not in (lat, lng, court_lat, court_lng):
+                        distance = distance_m(lat, lng, court_lat, court_lng)
+                        if distance > self.far_m:
+                            continue
+                        if distance <= self.near_m:
+                            threshold = self.near_name_threshold
+                    if score >= threshold and score > best_score:
+                        best_id, best_score = court_id, score
+        return best_id
+
+    def __len__(self):
+        with self._lock:
+            return len(self._courts)
+
+
+class CourtIndex:
+    """
+    某个区县已有球场的内存索引，创建时一次查询载入，之后插入的球场通过 add 同步
+    先按名称精确匹配，再按 FuzzyCourtIndex 模糊匹配，查重不再需要每个球场查询一次数据库
+    :param sql_conn: SqlConnector
+    :param fuzzy: 是否启用模糊匹配
+    """
+    def __init__(self, sql_conn, province: str, city: str, district: str, fuzzy: bool = True):
+        self.province = province
+        self.city = city
+        self.district = district
+        self._lock = threading.Lock()
+        self._ids = {}
+        self.fuzzy = FuzzyCourtIndex() if fuzzy else None
+        for court_id, name, latitude, longtitude in sql_conn.list_court_locations(province, city, district):
+            self.add(name, court_id, latitude, longtitude)
+
+    def get(self, name: str, latitude=None, longtitude=None):
+        """
+        返回同一球场的id，不存在返回None
+        """
+        with self._lock:
+            court_id = self._ids.get(court_key(name))
+        if court_id is None and self.fuzzy is not None:
+            court_id = self.fuzzy.find(name, latitude, longtitude)
+        return court_id
+
+    def add(self, name: str, court_id: int, latitude=None, longtitude=None):
+        with self._lock:
+            self._ids.setdefault(court_key(name), court_id)
+        if self.fuzzy is not None:
+            self.fuzzy.add(court_id, name, latitude, longtitude)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._ids)
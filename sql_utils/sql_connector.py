@@ -1,4 +1,9 @@
+import os
+import threading
+import time
 import pymysql
+from collections import deque
+from contextlib import contextmanager
 from typing import List, Optional, Any, Dict
 from dataclasses import dataclass, asdict
 
@@ -70,56 +75,297 @@ class CourtUnit:
     surface_type: Optional[str] = None
     surface_status: Optional[str] = None
 
+# 合并时可以累加的描述性字段，其余字段已有值时保留原值
+merge_text_fields = {
+    'description', 'nearest_transit', 'parking_fee_info', 'light_hours_desc', 'surface_notes',
+    'week_open_hours', 'free_open_hours', 'week_appointment_hours', 'appointment_type_desc',
+    'amenities_summary', 'unit_status', 'surface_status',
+}
+# 合并时不修改的字段
+merge_skip_fields = {'id', 'court_id', 'gmt_create', 'creator', 'creator_id'}
+
+
+def is_empty_value(value) -> bool:
+    return value is None or value == ''
+
+
+def merge_fields(existing, new) -> Dict[str, Any]:
+    """
+    把 new 中的非空字段合并到 existing，返回需要更新的 {字段: 新值}
+    existing 为空的字段直接填入；描述性字段两边都有值且不同时追加，其余字段保留原值
+    """
+    changes = {}
+    for field, value in asdict(new).items():
+        if field in merge_skip_fields or is_empty_value(value):
+            continue
+        old_value = getattr(existing, field, None)
+        if is_empty_value(old_value):
+            changes[field] = value
+        elif field in merge_text_fields and str(value) not in str(old_value):
+            changes[field] = f'{old_value}；{value}'
+    return changes
+
+
+class ConnectionPool:
+    """
+    pymysql 连接池，每次操作取出一个连接，用完归还，多个线程可以同时写入
+    :param min_size: 创建时预先建立的连接数
+    :param max_size: 最多同时存在的连接数，达到上限时等待其他线程归还
+    :param ping_interval: 连接空闲超过这个秒数后取出时先ping，断开则自动重连，为0时每次取出都ping
+    :param acquire_timeout: 等待连接的最长时间
+    :param connect_kwargs: pymysql.connect 的参数
+    """
+    def __init__(self, min_size: int = 1, max_size: int = 10, ping_interval: float = 0, acquire_timeout: float = 30, **connect_kwargs):
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.ping_interval = ping_interval
+        self.acquire_timeout = acquire_timeout
+        self.connect_kwargs = connect_kwargs
+        self._idle = deque()
+        self._size = 0
+        self._cond = threading.Condition()
+        for _ in range(min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    @classmethod
+    def from_env(cls):
+        """
+        从环境变量读取配置: MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB,
+        MYSQL_POOL_MIN, MYSQL_POOL_MAX, MYSQL_PING_INTERVAL
+        """
+        return cls(
+            min_size=int(os.getenv('MYSQL_POOL_MIN', 1)),
+            max_size=int(os.getenv('MYSQL_POOL_MAX', 10)),
+            ping_interval=float(os.getenv('MYSQL_PING_INTERVAL', 0)),
+            host=os.getenv('MYSQL_HOST', 'rm-bp156i07744k1d1th1o.mysql.rds.aliyuncs.com'),
+            port=int(os.getenv('MYSQL_PORT', 3306)),
+            user=os.getenv('MYSQL_USER', 'test_dbuser'),
+            passwd=os.getenv('MYSQL_PASSWORD', 'tZ7mpuAQuq@yDYN'),
+            db=os.getenv('MYSQL_DB', 'main_db'),
+            charset='utf8',
+            cursorclass=pymysql.cursors.DictCursor,
+        )
+
+    def _connect(self):
+        return pymysql.connect(**self.connect_kwargs)
+
+    def acquire(self):
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Exception(f'获取数据库连接超时，连接池已满: {self.max_size}')
+                self._cond.wait(remaining)
+        try:
+            if conn is None:
+                conn = self._connect()
+            elif time.monotonic() - last_used >= self.ping_interval:
+                conn.ping(reconnect=True)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def release(self, conn, discard: bool = False):
+        """
+        归还连接，discard 为True时关闭该连接，下次取出时新建
+        """
+        with self._cond:
+            if discard:
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if discard:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def stats(self):
+        with self._cond:
+            return {'size': self._size, 'idle': len(self._idle), 'busy': self._size - len(self._idle), 'max_size': self.max_size}
+
+    def close(self):
+        with self._cond:
+            conns = [conn for conn, last_used in self._idle]
+            self._size -= len(conns)
+            self._idle.clear()
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
 class SqlConnector:
-    def __init__(self):
-        self.conn = pymysql.connect(host='rm-bp156i07744k1d1th1o.mysql.rds.aliyuncs.com', 
-                                    port=3306, 
-                                    user='test_dbuser', 
-                                    passwd='tZ7mpuAQuq@yDYN', 
-                                    db='main_db', 
-                                    charset='utf8', 
-                                    cursorclass=pymysql.cursors.DictCursor)
+    def __init__(self, flush_size: int = 500, pool: ConnectionPool = None):
+        """
+        :param flush_size: 批量插入时每条INSERT语句最多包含的行数
+        :param pool: 连接池，默认按环境变量创建，见 ConnectionPool.from_env
+        """
+        self.flush_size = flush_size
+        self.pool = pool or ConnectionPool.from_env()
+        # 每个线程自己的事务连接
+        self._local = threading.local()
+        self._auto_increment_increment = None
 
     def close(self):
-        self.conn.close()
+        self.pool.close()
+
+    @contextmanager
+    def connection(self):
+        """
+        取出一个连接，事务中返回该线程事务使用的连接
+        连接断开导致的异常会丢弃该连接
+        归还前回滚，结束查询隐式开启的事务，下次取出时不会读到旧的快照，也不会一直持有元数据锁
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self.pool.acquire()
+        discard = False
+        try:
+            yield conn
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            discard = True
+            raise
+        finally:
+            if not discard:
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+            self.pool.release(conn, discard)
+
+    @contextmanager
+    def transaction(self):
+        """
+        工作单元，当前线程块内的写入使用同一个连接，只在结束时提交一次，发生异常时全部回滚，可以嵌套
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        with self.connection() as conn:
+            self._local.conn = conn
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                raise
+            finally:
+                self._local.conn = None
+
+    def _commit(self, conn):
+        if getattr(self._local, 'conn', None) is None:
+            conn.commit()
+
+    def _bulk_insert(self, table: str, rows: list) -> List[int]:
+        """
+        多行VALUES批量插入，非空字段相同的行合并为一条INSERT，每条最多 flush_size 行
+        一条INSERT生成的自增id是连续的，按 lastrowid 和 auto_increment_increment 推算每行的id并回填到 row.id
+        返回与 rows 一一对应的id
+        """
+        if not rows:
+            return []
+        ids = [None] * len(rows)
+        groups = {}
+        for index, row in enumerate(rows):
+            fields = tuple(k for k, v in asdict(row).items() if v is not None and v != '' and k != 'id')
+            groups.setdefault(fields, []).append(index)
+        with self.transaction() as conn:
+            with conn.cursor() as cursor:
+                if self._auto_increment_increment is None:
+                    cursor.execute("SELECT @@auto_increment_increment AS increment")
+                    self._auto_increment_increment = int(cursor.fetchone()['increment'])
+                for fields, indexes in groups.items():
+                    for start in range(0, len(indexes), self.flush_size):
+                        chunk = indexes[start:start + self.flush_size]
+                        values = [getattr(rows[index], k) for index in chunk for k in fields]
+                        placeholders = ', '.join(['(' + ', '.join(['%s'] * len(fields)) + ')'] * len(chunk))
+                        sql = f"INSERT INTO {table} ({', '.join(fields)}) VALUES {placeholders}"
+                        cursor.execute(sql, values)
+                        for offset, index in enumerate(chunk):
+                            ids[index] = cursor.lastrowid + offset * self._auto_increment_increment
+                            rows[index].id = ids[index]
+        return ids
 
     # --- BasketballCourt CRUD ---
     def insert_basketball_court(self, court: BasketballCourt) -> int:
-        with self.conn.cursor() as cursor:
+        with self.connection() as conn, conn.cursor() as cursor:
             fields = [k for k, v in asdict(court).items() if v is not None and v != '' and k != 'id']
             values = [getattr(court, k) for k in fields]
             sql = f"INSERT INTO basketball_courts ({', '.join(fields)}) VALUES ({', '.join(['%s']*len(values))})"
             cursor.execute(sql, values)
-            self.conn.commit()
+            self._commit(conn)
             return cursor.lastrowid
 
+    def insert_basketball_courts(self, courts: List[BasketballCourt]) -> List[int]:
+        """
+        批量插入球场，返回与 courts 一一对应的id
+        """
+        return self._bulk_insert('basketball_courts', courts)
+
+    def insert_courts_with_units(self, items: List[tuple]) -> List[int]:
+        """
+        在一个事务中批量插入球场及其单元
+        :param items: [(BasketballCourt, [CourtUnit, ...]), ...]，单元的 court_id 会被设置为对应球场的id
+        返回球场id列表
+        """
+        with self.transaction():
+            court_ids = self.insert_basketball_courts([court for court, units in items])
+            all_units = []
+            for court_id, (court, units) in zip(court_ids, items):
+                for unit in units:
+                    unit.court_id = court_id
+                    all_units.append(unit)
+            self.insert_court_units(all_units)
+        return court_ids
+
     def get_basketball_court(self, court_id: int) -> Optional[BasketballCourt]:
-        with self.conn.cursor() as cursor:
+        with self.connection() as conn, conn.cursor() as cursor:
             sql = "SELECT * FROM basketball_courts WHERE id=%s"
             cursor.execute(sql, (court_id,))
             row = cursor.fetchone()
             return BasketballCourt(**row) if row else None
 
     def update_basketball_court(self, court: BasketballCourt) -> bool:
-        with self.conn.cursor() as cursor:
+        with self.connection() as conn, conn.cursor() as cursor:
             fields = [k for k, v in asdict(court).items() if v is not None and v != '' and k != 'id']
             values = [getattr(court, k) for k in fields]
             if not fields:
                 return False
             sql = f"UPDATE basketball_courts SET {', '.join([f'{k}=%s' for k in fields])} WHERE id=%s"
             cursor.execute(sql, values + [court.id])
-            self.conn.commit()
+            self._commit(conn)
             return cursor.rowcount > 0
 
     def delete_basketball_court(self, court_id: int) -> bool:
-        with self.conn.cursor() as cursor:
+        with self.connection() as conn, conn.cursor() as cursor:
             sql = "DELETE FROM basketball_courts WHERE id=%s"
             cursor.execute(sql, (court_id,))
-            self.conn.commit()
+            self._commit(conn)
             return cursor.rowcount > 0
 
     def list_basketball_courts(self, where: str = '', params: List[Any] = []) -> List[BasketballCourt]:
-        with self.conn.cursor() as cursor:
+        with self.connection() as conn, conn.cursor() as cursor:
             sql = "SELECT * FROM basketball_courts"
             if where:
                 sql += f" WHERE {where}"
@@ -131,52 +377,130 @@ class SqlConnector:
         """
         根据名称、省、市、区/县查询是否存在该球场
         """
-        with self.conn.cursor() as cursor:
+        with self.connection() as conn, conn.cursor() as cursor:
             sql = "SELECT * FROM basketball_courts WHERE name=%s AND province=%s AND city=%s AND district=%s LIMIT 1"
             cursor.execute(sql, (name, province, city, district))
             row = cursor.fetchone()
             return BasketballCourt(**row) if row else None
 
+    def list_court_locations(self, province: str, city: str, district: str) -> List[tuple]:
+        """
+        返回该区县所有球场的 (id, name, latitude, longtitude)
+        """
+        with self.connection() as conn, conn.cursor() as cursor:
+            sql = "SELECT id, name, latitude, longtitude FROM basketball_courts WHERE province=%s AND city=%s AND district=%s"
+            cursor.execute(sql, (province, city, district))
+            return [(row['id'], row['name'], row['latitude'], row['longtitude']) for row in cursor.fetchall()]
+
     # --- CourtUnit CRUD ---
     def insert_court_unit(self, unit: CourtUnit) -> int:
-        with self.conn.cursor() as cursor:
+        with self.connection() as conn, conn.cursor() as cursor:
             fields = [k for k, v in asdict(unit).items() if v is not None and v != '' and k != 'id']
             values = [getattr(unit, k) for k in fields]
             sql = f"INSERT INTO court_units ({', '.join(fields)}) VALUES ({', '.join(['%s']*len(values))})"
             cursor.execute(sql, values)
-            self.conn.commit()
+            self._commit(conn)
             return cursor.lastrowid
 
+    def insert_court_units(self, units: List[CourtUnit]) -> List[int]:
+        """
+        批量插入球场单元，返回与 units 一一对应的id
+        """
+        return self._bulk_insert('court_units', units)
+
     def get_court_unit(self, unit_id: int) -> Optional[CourtUnit]:
-        with self.conn.cursor() as cursor:
+        with self.connection() as conn, conn.cursor() as cursor:
             sql = "SELECT * FROM court_units WHERE id=%s"
             cursor.execute(sql, (unit_id,))
             row = cursor.fetchone()
             return CourtUnit(**row) if row else None
 
     def update_court_unit(self, unit: CourtUnit) -> bool:
-        with self.conn.cursor() as cursor:
+        with self.connection() as conn, conn.cursor() as cursor:
             fields = [k for k, v in asdict(unit).items() if v is not None and v != '' and k != 'id']
             values = [getattr(unit, k) for k in fields]
             if not fields:
                 return False
             sql = f"UPDATE court_units SET {', '.join([f'{k}=%s' for k in fields])} WHERE id=%s"
             cursor.execute(sql, values + [unit.id])
-            self.conn.commit()
+            self._commit(conn)
             return cursor.rowcount > 0
 
     def delete_court_unit(self, unit_id: int) -> bool:
-        with self.conn.cursor() as cursor:
+        with self.connection() as conn, conn.cursor() as cursor:
             sql = "DELETE FROM court_units WHERE id=%s"
             cursor.execute(sql, (unit_id,))
-            self.conn.commit()
+            self._commit(conn)
             return cursor.rowcount > 0
 
     def list_court_units(self, where: str = '', params: List[Any] = []) -> List[CourtUnit]:
-        with self.conn.cursor() as cursor:
+        with self.connection() as conn, conn.cursor() as cursor:
             sql = "SELECT * FROM court_units"
             if where:
                 sql += f" WHERE {where}"
             cursor.execute(sql, params)
             rows = cursor.fetchall()
-            return [CourtUnit(**row) for row in rows]
\ No newline at end of file
+            return [CourtUnit(**row) for row in rows]
+
+    # --- Upsert ---
+    def _update_fields(self, table: str, row_id: int, changes: Dict[str, Any]) -> bool:
+        if not changes:
+            return False
+        with self.connection() as conn, conn.cursor() as cursor:
+            sql = f"UPDATE {table} SET {', '.join([f'{k}=%s' for k in changes])} WHERE id=%s"
+            cursor.execute(sql, list(changes.values()) + [row_id])
+            self._commit(conn)
+            return cursor.rowcount > 0
+
+    def upsert_court_with_units(self, court: BasketballCourt, units: List[CourtUnit], court_id: Optional[int] = None) -> tuple:
+        """
+        在一个事务中插入或合并球场及其单元
+        按 court_id（未传入时按名称、省、市、区/县）查找已有球场，不存在则插入；存在则把非空字段合并到已有记录，见 merge_fields
+        单元按名称匹配，没有名称的按类型匹配一个还未匹配的已有单元，匹配到的合并，匹配不到的插入
+        只按主键锁住已有的球场行；表上没有唯一键，并发插入同一个新球场仍可能重复，调用方通过 CourtIndex 查重
+        返回 (court_id, 是否新建)
+        """
+        with self.transaction() as conn:
+            with conn.cursor() as cursor:
+                if court_id is None:
+                    # 这几列没有索引，加锁读会扫描并锁住整张表，只用普通查询找到id，再按主键加锁
+                    cursor.execute(
+                        "SELECT id FROM basketball_courts WHERE name=%s AND province=%s AND city=%s AND district=%s LIMIT 1",
+                        (court.name, court.province, court.city, court.district)
+                    )
+                    row = cursor.fetchone()
+                    court_id = row['id'] if row else None
+                row = None
+                if court_id is not None:
+                    cursor.execute("SELECT * FROM basketball_courts WHERE id=%s FOR UPDATE", (court_id,))
+                    row = cursor.fetchone()
+            if row is None:
+                return self.insert_courts_with_units([(court, units)])[0], True
+
+            existing_court = BasketballCourt(**row)
+            court.id = existing_court.id
+            self._update_fields('basketball_courts', existing_court.id, merge_fields(existing_court, court))
+
+            existing_units = self.list_court_units('court_id=%s', [existing_court.id])
+            matched = set()
+            new_units = []
+            for unit in units:
+                unit.court_id = existing_court.id
+                target = None
+                for existing_unit in existing_units:
+                    if existing_unit.id in matched:
+                        continue
+                    if unit.unit_name and existing_unit.unit_name == unit.unit_name:
+                        target = existing_unit
+                        break
+                    if not unit.unit_name and existing_unit.unit_type == unit.unit_type:
+                        target = existing_unit
+                        break
+                if target is None:
+                    new_units.append(unit)
+                    continue
+                matched.add(target.id)
+                unit.id = target.id
+                self._update_fields('court_units', target.id, merge_fields(target, unit))
+            self.insert_court_units(new_units)
+        return existing_court.id, False
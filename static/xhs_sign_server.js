@@ -0,0 +1,75 @@
+/**
+ * 常驻签名进程
+ * 启动时只加载一次签名脚本，之后通过 stdin/stdout 按行收发 JSON:
+ *   请求: {"id": 1, "fn": "get_request_headers_params", "args": [...]}
+ *   响应: {"id": 1, "ok": true, "result": ...} / {"id": 1, "ok": false, "error": "..."}
+ * 用法: node xhs_sign_server.js <签名脚本路径>
+ */
+const fs = require('fs');
+const path = require('path');
+const vm = require('vm');
+const readline = require('readline');
+const { createRequire } = require('module');
+
+// stdout 只用于协议，签名脚本里的输出全部转到 stderr
+const write = process.stdout.write.bind(process.stdout);
+const log = function () {
+    process.stderr.write(Array.prototype.join.call(arguments, ' ') + '\n');
+};
+console.log = console.info = console.warn = console.error = console.debug = log;
+
+function reply(msg) {
+    write(JSON.stringify(msg) + '\n');
+}
+
+function load(filename) {
+    filename = path.resolve(filename);
+    const source = fs.readFileSync(filename, 'utf-8');
+    // 和 execjs 一样在函数作用域里执行脚本，再通过 eval 取出脚本中定义的函数
+    const wrapper = vm.runInThisContext(
+        '(function (require, module, exports, __filename, __dirname) {\n' + source +
+        '\n;return function (name) { return eval(name); };\n})',
+        { filename: filename }
+    );
+    const mod = { exports: {} };
+    return wrapper(createRequire(filename), mod, mod.exports, filename, path.dirname(filename));
+}
+
+let lookup;
+try {
+    lookup = load(process.argv[2]);
+} catch (e) {
+    reply({ id: 0, ok: false, error: String(e && e.stack || e) });
+    process.exit(1);
+}
+reply({ id: 0, ok: true, result: 'ready' });
+
+const rl = readline.createInterface({ input: process.stdin, terminal: false });
+rl.on('line', function (line) {
+    if (!line.trim()) {
+        return;
+    }
+    let req = {};
+    try {
+        req = JSON.parse(line);
+        // 健康检查
+        if (req.fn === '__ping__') {
+            reply({ id: req.id, ok: true, result: 'pong' });
+            return;
+        }
+        if (!/^[A-Za-z_$][\w$]*$/.test(req.fn)) {
+            throw new Error('invalid function name: ' + req.fn);
+        }
+        const fn = lookup(req.fn);
+        if (typeof fn !== 'function') {
+            throw new Error(req.fn + ' is not a function');
+        }
+        const result = fn.apply(null, req.args || []);
+        reply({ id: req.id, ok: true, result: result === undefined ? null : result });
+    } catch (e) {
+        reply({ id: req.id, ok: false, error: String(e && e.stack || e) });
+    }
+});
+rl.on('close', function () {
+    process.exit(0);
+});
@@ -0,0 +1,94 @@
+"""
+翻页断点续爬测试脚本
+第 N 页请求失败后中断，再次运行时从断点继续，两次得到的结果合起来必须包含全部笔记
+"""
+
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from apis.xhs_pc_apis import XHS_Apis
+from xhs_utils.checkpoint_util import CheckpointStore
+
+page_size = 20
+total_pages = 5
+
+
+def make_apis(fail_page=None):
+    """搜索接口替换为本地数据，fail_page 页请求失败"""
+    store = CheckpointStore(os.path.join(tempfile.mkdtemp(), 'checkpoints.db'))
+    xhs_apis = XHS_Apis(checkpoint_store=store)
+    requested = []
+
+    def search_note(query, cookies_str, page, *args):
+        requested.append(page)
+        if page == fail_page:
+            return False, f'第{page}页请求失败', None
+        items = [{'id': f'{page}-{index}', 'model_type': 'note'} for index in range(page_size)]
+        return True, 'success', {'data': {'items': items, 'has_more': page < total_pages}}
+
+    xhs_apis.search_note = search_note
+    return xhs_apis, requested
+
+
+def all_ids():
+    return {f'{page}-{index}' for page in range(1, total_pages + 1) for index in range(page_size)}
+
+
+def test_resume_by_page():
+    """测试按页处理时中断后续爬，已处理和续爬的笔记合起来完整，且不重复请求已处理的页"""
+    xhs_apis, requested = make_apis(fail_page=3)
+    processed = []
+    try:
+        for notes in xhs_apis.iter_search_some_note('篮球场', 1000, '', by_page=True):
+            processed.extend(note['id'] for note in notes)
+    except Exception:
+        pass
+    assert len(processed) == 2 * page_size
+
+    def search_note(query, cookies_str, page, *args):
+        requested.append(page)
+        items = [{'id': f'{page}-{index}', 'model_type': 'note'} for index in range(page_size)]
+        return True, 'success', {'data': {'items': items, 'has_more': page < total_pages}}
+
+    xhs_apis.search_note = search_note
+    requested.clear()
+    for notes in xhs_apis.iter_search_some_note('篮球场', 1000, '', by_page=True):
+        processed.extend(note['id'] for note in notes)
+    assert requested == [3, 4, 5]
+    assert len(processed) == len(all_ids())
+    assert set(processed) == all_ids()
+
+
+def test_unconsumed_page_not_skipped():
+    """测试调用方取到某页但没处理完就中断时，续爬仍从这一页开始"""
+    xhs_apis, requested = make_apis()
+    pages = xhs_apis.iter_search_some_note('篮球场', 1000, '', by_page=True)
+    next(pages)
+    pages.close()
+    requested.clear()
+    processed = []
+    for notes in xhs_apis.iter_search_some_note('篮球场', 1000, '', by_page=True):
+        processed.extend(note['id'] for note in notes)
+    assert requested[0] == 1
+    assert set(processed) == all_ids()
+
+
+def test_list_wrapper_does_not_skip():
+    """测试返回列表的接口失败时不记录断点，重新运行得到全部笔记"""
+    xhs_apis, requested = make_apis(fail_page=3)
+    success, msg, notes = xhs_apis.search_some_note('篮球场', 1000, '')
+    assert not success
+    xhs_apis_ok, _ = make_apis()
+    xhs_apis.search_note = xhs_apis_ok.search_note
+    success, msg, notes = xhs_apis.search_some_note('篮球场', 1000, '')
+    assert success
+    assert {note['id'] for note in notes} == all_ids()
+
+
+if __name__ == "__main__":
+    test_resume_by_page()
+    test_unconsumed_page_not_skipped()
+    test_list_wrapper_does_not_skip()
+    print("✓ 所有测试完成！")
@@ -0,0 +1,75 @@
+"""
+球场名称模糊查重测试脚本
+FuzzyCourtIndex 的匹配结果会用于合并数据库中的记录，除了应当匹配的写法，也检查不应合并的球场
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sql_utils.court_index import FuzzyCourtIndex, CourtIndex, normalize_court_name
+
+
+def test_normalize_suffix_only():
+    """测试只去掉名称末尾的通用词，其他运动的场地保留"""
+    assert normalize_court_name('XX公园篮球场') == 'xx公园'
+    assert normalize_court_name('XX公园球场') == 'xx公园'
+    assert normalize_court_name('黄龙体育中心 室外篮球场') == '黄龙体育中心'
+    assert normalize_court_name('球场路小学篮球场') == '球场路小学'
+    assert normalize_court_name('滨江体育馆羽毛球场') == '滨江体育馆羽毛球场'
+
+
+def test_same_court_different_suffix():
+    """测试请求中的例子: 同一球场不同写法"""
+    index = FuzzyCourtIndex()
+    index.add(1, 'XX公园篮球场')
+    index.add(2, '黄龙体育中心篮球场')
+    assert index.find('XX公园球场') == 1
+    assert index.find('黄龙体育中心室外篮球场') == 2
+
+
+def test_other_sport_not_matched():
+    """测试其他运动的场地不会匹配到篮球场"""
+    index = FuzzyCourtIndex()
+    index.add(1, '滨江体育馆篮球场', 30.2, 120.2)
+    assert index.find('滨江体育馆羽毛球场') is None
+    assert index.find('滨江体育馆羽毛球场', 30.2, 120.2) is None
+
+
+def test_sub_area_not_matched():
+    """测试没有坐标时，名称多出区域的球场不会匹配"""
+    index = FuzzyCourtIndex()
+    index.add(1, '西湖公园篮球场')
+    assert index.find('西湖公园北区篮球场') is None
+
+
+def test_coordinates():
+    """测试近处放宽名称要求，远处的同名球场不匹配"""
+    index = FuzzyCourtIndex()
+    index.add(1, '滨江公园篮球场', 30.2, 120.2)
+    assert index.find('滨江公园篮球场', 30.2001, 120.2001) == 1
+    assert index.find('滨江公园篮球场', 30.5, 120.9) is None
+    assert index.find('滨江公园灯光篮球场', 30.2001, 120.2001) == 1
+    assert index.find('滨江公园灯光篮球场') is None
+
+
+def test_court_index_fallback():
+    """测试 CourtIndex 精确匹配不到时使用模糊匹配"""
+    class Connector:
+        def list_court_locations(self, province, city, district):
+            return [(7, 'A公园篮球场', None, None)]
+
+    index = CourtIndex(Connector(), '浙江省', '杭州市', '西湖区')
+    assert index.get('A公园篮球场') == 7
+    assert index.get('a公园球场') == 7
+    assert index.get('B公园篮球场') is None
+
+
+if __name__ == "__main__":
+    test_normalize_suffix_only()
+    test_same_court_different_suffix()
+    test_other_sport_not_matched()
+    test_sub_area_not_matched()
+    test_coordinates()
+    test_court_index_fallback()
+    print("✓ 所有测试完成！")
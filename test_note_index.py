@@ -0,0 +1,76 @@
+"""
+增量爬取笔记索引测试脚本
+内容和互动数量的有效期都未过期时才跳过笔记，任一过期都要重新获取
+"""
+
+import sys
+import os
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from xhs_utils.note_index_util import NoteIndex
+
+hour = 3600
+note_info = {'note_id': 'n1', 'title': '篮球场', 'desc': '', 'image_list': [], 'liked_count': '1'}
+
+
+def make_index():
+    return NoteIndex(os.path.join(tempfile.mkdtemp(), 'note_index.db'), content_ttl=7 * 24 * hour, counts_ttl=24 * hour)
+
+
+def set_fetched_at(index, seconds_ago, content_seconds_ago=None):
+    """把记录的获取时间改到若干秒之前"""
+    now = time.time()
+    content_seconds_ago = seconds_ago if content_seconds_ago is None else content_seconds_ago
+    index.conn.execute("UPDATE notes SET counts_updated_at=?, content_updated_at=? WHERE note_id=?",
+                       (now - seconds_ago, now - content_seconds_ago, note_info['note_id']))
+    index.conn.commit()
+
+
+def test_fresh_after_update():
+    """测试刚记录的笔记在有效期内"""
+    index = make_index()
+    assert not index.is_fresh('n1')
+    index.update(note_info)
+    assert index.is_fresh('n1')
+    index.close()
+
+
+def test_counts_ttl_not_overridden():
+    """测试互动数量过期后，即使内容有效期更长也要重新获取"""
+    index = make_index()
+    index.update(note_info)
+    set_fetched_at(index, 2 * 24 * hour)
+    assert not index.is_fresh('n1')
+    index.close()
+
+
+def test_content_ttl_from_last_fetch():
+    """测试内容很久没变化但刚获取过的笔记仍在有效期内"""
+    index = make_index()
+    index.update(note_info)
+    set_fetched_at(index, hour, content_seconds_ago=30 * 24 * hour)
+    assert index.is_fresh('n1')
+    index.content_ttl = 0
+    assert not index.is_fresh('n1')
+    index.close()
+
+
+def test_unchanged_refresh():
+    """测试内容没变化时重新获取只刷新获取时间，再次进入有效期"""
+    index = make_index()
+    index.update(note_info)
+    set_fetched_at(index, 2 * 24 * hour)
+    assert not index.is_changed(note_info)
+    assert not index.update(note_info)
+    assert index.is_fresh('n1')
+    index.close()
+
+
+if __name__ == "__main__":
+    test_fresh_after_update()
+    test_counts_ttl_not_overridden()
+    test_content_ttl_from_last_fetch()
+    test_unchanged_refresh()
+    print("✓ 所有测试完成！")
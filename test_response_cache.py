@@ -0,0 +1,71 @@
+"""
+接口结果缓存测试脚本
+xsec_token 每次运行都不同，只有 xsec_token 不同的请求必须命中缓存，包括下次运行时从sqlite读取
+"""
+
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from xhs_utils.cache_util import ResponseCache
+
+
+def make_endpoint(calls):
+    def get_note_out_comment(note_id: str, cursor: str, xsec_token: str, cookies_str: str, proxies: dict = None):
+        calls.append((note_id, cursor, xsec_token))
+        return True, 'success', {'data': {'comments': [note_id + cursor]}}
+    return get_note_out_comment
+
+
+def test_hit_when_only_xsec_token_differs():
+    """测试只有 xsec_token 不同时命中内存缓存"""
+    calls = []
+    cache = ResponseCache(db_path=None)
+    fetch = cache.wrap('get_note_out_comment', make_endpoint(calls))
+    assert fetch('note1', '', 'token-a', 'a1=x')[2] == {'data': {'comments': ['note1']}}
+    success, msg, res_json = fetch('note1', '', 'token-b', 'a1=x')
+    assert (success, msg) == (True, 'cache')
+    assert len(calls) == 1
+    fetch('note1', 'cursor2', 'token-b', 'a1=x')
+    assert len(calls) == 2
+
+
+def test_hit_across_runs():
+    """测试下次运行（新的缓存实例）使用新的 xsec_token 时从sqlite命中"""
+    db_path = os.path.join(tempfile.mkdtemp(), 'response_cache.db')
+    calls = []
+    cache = ResponseCache(db_path=db_path)
+    cache.wrap('get_note_out_comment', make_endpoint(calls))('note1', '', 'token-a', 'a1=x')
+    cache.close()
+    cache = ResponseCache(db_path=db_path)
+    success, msg, res_json = cache.wrap('get_note_out_comment', make_endpoint(calls))('note1', '', 'token-b', 'a1=x')
+    assert msg == 'cache'
+    assert len(calls) == 1
+    assert cache.stats()['get_note_out_comment']['disk_hits'] == 1
+
+
+def test_inner_comment_keyed_by_id():
+    """测试二级评论按评论id缓存，评论的点赞数和已获取的二级评论变化不影响命中"""
+    calls = []
+
+    def get_note_inner_comment(comment: dict, cursor: str, xsec_token: str, cookies_str: str, proxies: dict = None):
+        calls.append(comment['id'])
+        return True, 'success', {'data': {'comments': []}}
+
+    cache = ResponseCache(db_path=None)
+    fetch = cache.wrap('get_note_inner_comment', get_note_inner_comment)
+    comment = {'id': 'c1', 'note_id': 'note1', 'like_count': '3', 'sub_comments': []}
+    fetch(comment, '', 'token-a', 'a1=x')
+    comment['like_count'] = '4'
+    comment['sub_comments'].append({'id': 'c2'})
+    assert fetch(comment, '', 'token-b', 'a1=x')[1] == 'cache'
+    fetch({'id': 'c3', 'note_id': 'note1'}, '', 'token-b', 'a1=x')
+    assert calls == ['c1', 'c3']
+
+
+if __name__ == "__main__":
+    test_hit_when_only_xsec_token_differs()
+    test_hit_across_runs()
+    test_inner_comment_keyed_by_id()
+    print("✓ 所有测试完成！")
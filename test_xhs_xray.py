@@ -0,0 +1,57 @@
+"""
+x-xray-traceid python实现测试脚本
+static/xhs_xray_traceid.json 由 node 执行 static/xhs_xray.js 生成：
+记录每次调用 traceId(timestamp) 前的 Int.SEQ、期间 Math.random 的返回值以及输出结果，
+python实现使用同样的输入重放，结果必须逐位一致
+"""
+
+import sys
+import os
+import json
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from xhs_utils import xhs_util
+
+fixture_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/xhs_xray_traceid.json')
+
+
+def load_fixture():
+    with open(fixture_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_max_seq():
+    """测试序号上限与js一致"""
+    assert xhs_util.XRAY_MAX_SEQ == load_fixture()['max_seq']
+
+
+def test_traceid_matches_js():
+    """测试与js生成的traceId逐位一致"""
+    for case in load_fixture()['cases']:
+        xhs_util.xray_seq = case['seq']
+        rand = iter(case['random']).__next__
+        traceid = xhs_util.generate_xray_traceid_py(case['timestamp'], rand)
+        assert traceid == case['traceid'], f"{case['timestamp']}: {traceid} != {case['traceid']}"
+
+
+def test_seq_increment():
+    """测试序号自增及溢出归零"""
+    xhs_util.xray_seq = xhs_util.XRAY_MAX_SEQ
+    assert xhs_util.next_xray_seq() == xhs_util.XRAY_MAX_SEQ
+    assert xhs_util.next_xray_seq() == 0
+    assert xhs_util.next_xray_seq() == 1
+
+
+def test_traceid_format():
+    """测试默认参数下的输出格式"""
+    traceid = xhs_util.generate_xray_traceid()
+    assert len(traceid) == 32
+    int(traceid, 16)
+
+
+if __name__ == "__main__":
+    test_max_seq()
+    test_traceid_matches_js()
+    test_seq_increment()
+    test_traceid_format()
+    print("✓ 所有测试完成！")
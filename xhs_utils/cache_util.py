@@ -0,0 +1,189 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from xhs_utils.session_util import SessionPool
+
+default_db_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../datas/response_cache.db'))
+# 每个接口的缓存有效期(秒)，只缓存这里列出的接口
+default_ttls = {
+    'get_note_info': 6 * 3600,
+    'get_user_info': 24 * 3600,
+    'get_user_note_info': 3600,
+    'search_note': 3600,
+    'search_user': 3600,
+    'get_note_out_comment': 3600,
+    'get_note_inner_comment': 3600,
+}
+# 每次获取都会变化、不影响返回内容的参数，url中的同名参数和接口的同名参数都不参与缓存键
+volatile_url_params = ('xsec_token', 'xsec_source')
+# 对象参数中只有这些字段参与缓存键，其余字段（如评论的点赞数、已获取的二级评论）会变化
+object_key_fields = {
+    'comment': ('note_id', 'id'),
+}
+
+
+def normalize_param(value):
+    if isinstance(value, str) and value.startswith('http'):
+        urlParse = urllib.parse.urlparse(value)
+        query = sorted(kv for kv in urllib.parse.parse_qsl(urlParse.query) if kv[0] not in volatile_url_params)
+        return urlParse.path + ('?' + urllib.parse.urlencode(query) if query else '')
+    return value
+
+
+class ResponseCache():
+    """
+        XHS_Apis 接口返回结果的缓存，键为 (接口, 参数, cookies身份)
+        内存LRU在前，sqlite在后，只缓存请求成功的结果
+        :param ttls: {接口名: 有效期秒数}，默认 default_ttls
+        :param max_memory_items: 内存中最多缓存的条数
+        :param db_path: sqlite文件路径，为None时只缓存在内存
+    """
+    def __init__(self, ttls: dict = None, max_memory_items: int = 1024, db_path: str = default_db_path):
+        self.ttls = dict(default_ttls if ttls is None else ttls)
+        self.max_memory_items = max_memory_items
+        self.db_path = db_path
+        self._memory = OrderedDict()
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.conn = None
+        if db_path is not None:
+            db_dir = os.path.dirname(os.path.abspath(db_path))
+            if not os.path.exists(db_dir):
+                os.makedirs(db_dir)
+            self.conn = sqlite3.connect(db_path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, endpoint TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self.conn.commit()
+
+    @staticmethod
+    def make_key(endpoint: str, params: dict, cookies_str: str = None):
+        """
+            去掉 volatile_url_params 中的参数，url参数中的同名参数也去掉，对象参数只保留 object_key_fields 中的字段
+        """
+        params = {name: normalize_param(value) for name, value in params.items() if name not in volatile_url_params}
+        for name, fields in object_key_fields.items():
+            if isinstance(params.get(name), dict):
+                params[name] = {field: params[name].get(field) for field in fields}
+        raw = json.dumps([endpoint, params, SessionPool.identity(cookies_str)[0]], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _count(self, endpoint: str, name: str):
+        metrics = self._metrics.setdefault(endpoint, {'memory_hits': 0, 'disk_hits': 0, 'misses': 0})
+        metrics[name] += 1
+
+    def get(self, endpoint: str, key: str):
+        """
+            返回缓存的结果，没有或已过期返回None
+        """
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                _, value, expires_at = item
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._count(endpoint, 'memory_hits')
+                    # 每次返回新的对象，调用方修改结果不会影响缓存
+                    return json.loads(value)
+                del self._memory[key]
+            if self.conn is not None:
+                row = self.conn.execute("SELECT value, expires_at FROM responses WHERE key=?", (key,)).fetchone()
+                if row is not None and row[1] > now:
+                    self._remember(endpoint, key, row[0], row[1])
+                    self._count(endpoint, 'disk_hits')
+                    return json.loads(row[0])
+            self._count(endpoint, 'misses')
+        return None
+
+    def _remember(self, endpoint: str, key: str, value: str, expires_at: float):
+        self._memory[key] = (endpoint, value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def set(self, endpoint: str, key: str, value):
+        expires_at = time.time() + self.ttls[endpoint]
+        value = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._remember(endpoint, key, value, expires_at)
+            if self.conn is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, endpoint, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, endpoint, value, expires_at)
+                )
+                self.conn.commit()
+
+    def wrap(self, endpoint: str, func):
+        """
+            包装返回 (success, msg, res_json) 的接口方法，cookies_str 和 proxies 参数不参与缓存键的参数部分
+            xsec_token 等参数、对象参数中的非标识字段也不参与，见 make_key
+        """
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+            cookies_str = params.pop('cookies_str', None)
+            params.pop('proxies', None)
+            key = self.make_key(endpoint, params, cookies_str)
+            res_json = self.get(endpoint, key)
+            if res_json is not None:
+                return True, 'cache', res_json
+            success, msg, res_json = func(*args, **kwargs)
+            if success:
+                self.set(endpoint, key, res_json)
+            return success, msg, res_json
+        return wrapper
+
+    def stats(self):
+        """
+            返回每个接口的命中统计
+        """
+        with self._lock:
+            result = {}
+            for endpoint, metrics in self._metrics.items():
+                total = sum(metrics.values())
+                hits = metrics['memory_hits'] + metrics['disk_hits']
+                result[endpoint] = dict(metrics, hit_rate=hits / total if total else 0)
+            result['memory_items'] = len(self._memory)
+        return result
+
+    def purge(self):
+        """
+            删除sqlite中已过期的结果
+        """
+        if self.conn is None:
+            return
+        with self._lock:
+            self.conn.execute("DELETE FROM responses WHERE expires_at<=?", (time.time(),))
+            self.conn.commit()
+
+    def clear(self, endpoint: str = None):
+        with self._lock:
+            if endpoint is None:
+                self._memory.clear()
+            else:
+                for key in [key for key, item in self._memory.items() if item[0] == endpoint]:
+                    del self._memory[key]
+            if self.conn is not None:
+                if endpoint is None:
+                    self.conn.execute("DELETE FROM responses")
+                else:
+                    self.conn.execute("DELETE FROM responses WHERE endpoint=?", (endpoint,))
+                self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self.conn is not None:
+                self.conn.close()
@@ -0,0 +1,67 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+default_db_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../datas/checkpoints.db'))
+
+
+class CheckpointStore():
+    """
+        分页进度存储，按 (接口, 实体id) 记录最后一次成功消费的页的cursor
+        翻页全部完成后删除记录，中途失败时保留记录，下次从该cursor继续
+        :param db_path: sqlite文件路径
+    """
+    def __init__(self, db_path: str = default_db_path):
+        self.db_path = db_path
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        if not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "endpoint TEXT NOT NULL, entity_id TEXT NOT NULL, cursor TEXT NOT NULL, "
+            "has_more INTEGER NOT NULL, count INTEGER NOT NULL, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (endpoint, entity_id))"
+        )
+        self.conn.commit()
+
+    def get(self, endpoint: str, entity_id: str):
+        """
+            返回 {'cursor', 'has_more', 'count', 'updated_at'}，没有记录返回None
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT cursor, has_more, count, updated_at FROM checkpoints WHERE endpoint=? AND entity_id=?",
+                (endpoint, entity_id)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'cursor': json.loads(row[0]),
+            'has_more': bool(row[1]),
+            'count': row[2],
+            'updated_at': row[3],
+        }
+
+    def save(self, endpoint: str, entity_id: str, cursor, has_more: bool = True, count: int = 0):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (endpoint, entity_id, cursor, has_more, count, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (endpoint, entity_id, json.dumps(cursor), int(has_more), count, time.time())
+            )
+            self.conn.commit()
+
+    def clear(self, endpoint: str, entity_id: str = None):
+        with self._lock:
+            if entity_id is None:
+                self.conn.execute("DELETE FROM checkpoints WHERE endpoint=?", (endpoint,))
+            else:
+                self.conn.execute("DELETE FROM checkpoints WHERE endpoint=? AND entity_id=?", (endpoint, entity_id))
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
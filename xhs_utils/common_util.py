@@ -1,4 +1,7 @@
 import os
+import threading
+import time
+import urllib.parse
 from loguru import logger
 from dotenv import load_dotenv
 
@@ -20,3 +23,25 @@ def init():
         'excel': excel_base_path,
     }
     return cookies_str, base_path
+
+
+class RateLimiter():
+    """
+        按host限速，同一host每秒最多 rate 次请求，多线程共享
+        :param rate: 每秒请求数，为0时不限速
+    """
+    def __init__(self, rate: float = 0):
+        self.rate = rate
+        self._next_time = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        if not self.rate:
+            return
+        host = urllib.parse.urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            next_time = max(self._next_time.get(host, now), now)
+            self._next_time[host] = next_time + 1 / self.rate
+        if next_time > now:
+            time.sleep(next_time - now)
@@ -1,11 +1,13 @@
+import csv
 import json
 import os
 import re
 import time
 import openpyxl
-import requests
 from loguru import logger
 from retry import retry
+from xhs_utils.download_util import media_downloader
+from sql_utils.court_index import FuzzyCourtIndex
 
 
 def norm_str(str):
@@ -176,25 +178,71 @@ def handle_comment_info(data):
         'ip_location': ip_location,
         'pictures': pictures,
     }
+
+def write_rows(rows, file_path, headers, batch_size=10000):
+    """
+    逐行写出，行可以来自生成器，内存占用与行数无关
+    按文件后缀选择格式: .xlsx 使用 openpyxl 的 write_only 模式，.csv 使用utf-8-sig编码，.parquet 需要安装 pyarrow
+    :param rows: 每行为与 headers 对应的值列表
+    :param batch_size: parquet 每批写入的行数
+    :return: 写出的行数
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    count = 0
+    if ext == '.csv':
+        with open(file_path, mode='w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+    elif ext == '.parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = pa.schema([(header, pa.string()) for header in headers])
+        with pq.ParquetWriter(file_path, schema) as writer:
+            for batch in iter_batches(rows, batch_size):
+                columns = [[None if value is None else str(value) for value in column] for column in zip(*batch)]
+                writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+                count += len(batch)
+    else:
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(headers)
+        for row in rows:
+            ws.append(row)
+            count += 1
+        wb.save(file_path)
+    return count
+
+def iter_batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 def save_to_xlsx(datas, file_path, type='note'):
-    wb = openpyxl.Workbook()
-    ws = wb.active
+    """
+    datas 可以是生成器，边产生边写出，file_path 为 .csv 或 .parquet 后缀时保存为对应格式，见 write_rows
+    """
     if type == 'note':
         headers = ['笔记id', '笔记url', '笔记类型', '用户id', '用户主页url', '昵称', '头像url', '标题', '描述', '点赞数量', '收藏数量', '评论数量', '分享数量', '视频封面url', '视频地址url', '图片地址url列表', '标签', '上传时间', 'ip归属地']
     elif type == 'user':
         headers = ['用户id', '用户主页url', '用户名', '头像url', '小红书号', '性别', 'ip地址', '介绍', '关注数量', '粉丝数量', '作品被赞和收藏数量', '标签']
     else:
         headers = ['笔记id', '笔记url', '评论id', '用户id', '用户主页url', '昵称', '头像url', '评论内容', '评论标签', '点赞数量', '上传时间', 'ip归属地', '图片地址url列表']
-    ws.append(headers)
-    for data in datas:
-        data = {k: norm_text(str(v)) for k, v in data.items()}
-        ws.append(list(data.values()))
-    wb.save(file_path)
-    logger.info(f'数据保存至 {file_path}')
+    rows = ([norm_text(str(v)) for v in data.values()] for data in datas)
+    count = write_rows(rows, file_path, headers)
+    logger.info(f'{count} 条数据保存至 {file_path}')
 
 def save_processed_note_list_to_xlsx(processed_note_list, file_path):
-    wb = openpyxl.Workbook()
-    ws = wb.active
+    """
+    同一球场的多行先在内存中合并（只保存合并后的行），再流式写出，file_path 的格式见 write_rows
+    """
     headers = [
         '笔记url', '笔记类型', '标题', '描述', '视频地址url', '图片地址url列表',
         # 细粒度提取结果字段
@@ -202,10 +250,12 @@ def save_processed_note_list_to_xlsx(processed_note_list, file_path):
         '需预约', '预约方式', '全场数量', '半场数量', '有灯光', '开门时间', '关门时间', '24小时开放', '场地材质',
         '室内', '有停车场', '有免费停车场', '停车场名称', '停车场地址', '停车场免费', '其他描述'
     ]
-    ws.append(headers)
 
     header_idx = {h: i for i, h in enumerate(headers)}
+    merged_rows = []
     key_to_row = {}
+    # 名称不完全相同的同一球场按 (省, 市, 县/区) 模糊匹配已有的行
+    district_indexes = {}
 
     def parse_merge_value(val):
         result = {}
@@ -296,33 +346,31 @@ def save_processed_note_list_to_xlsx(processed_note_list, file_path):
             row[header_idx['球场名称']]
         )
 
-        if key in key_to_row:
-            exist_row_idx = key_to_row[key]
+        if key[:3] not in district_indexes:
+            district_indexes[key[:3]] = FuzzyCourtIndex()
+        district_index = district_indexes[key[:3]]
+        exist_row_idx = key_to_row.get(key)
+        if exist_row_idx is None:
+            exist_row_idx = district_index.find(key[3], item.get('latitude'), item.get('longtitude'))
+        if exist_row_idx is not None:
+            key_to_row[key] = exist_row_idx
+            exist_row = merged_rows[exist_row_idx]
             for col in range(len(row)):
-                old_val = ws.cell(row=exist_row_idx, column=col + 1).value or ''
-                new_val = row[col] or ''
-                merged_val = merge_field(str(old_val), str(new_val))
-                ws.cell(row=exist_row_idx, column=col + 1, value=merged_val)
+                exist_row[col] = merge_field(exist_row[col] or '', row[col] or '')
         else:
-            ws.append(row)
-            key_to_row[key] = ws.max_row
+            merged_rows.append(row)
+            key_to_row[key] = len(merged_rows) - 1
+            district_index.add(key_to_row[key], key[3], item.get('latitude'), item.get('longtitude'))
 
-    wb.save(file_path)
-    logger.info(f'处理后数据保存至 {file_path}')
+    count = write_rows(merged_rows, file_path, headers)
+    logger.info(f'处理后数据 {count} 行保存至 {file_path}')
 
-def download_media(path, name, url, type):
+def download_media(path, name, url, type, downloader=None):
+    downloader = downloader or media_downloader
     if type == 'image':
-        content = requests.get(url).content
-        with open(path + '/' + name + '.jpg', mode="wb") as f:
-            f.write(content)
+        downloader.download(url, path + '/' + name + '.jpg')
     elif type == 'video':
-        res = requests.get(url, stream=True)
-        size = 0
-        chunk_size = 1024 * 1024
-        with open(path + '/' + name + '.mp4', mode="wb") as f:
-            for data in res.iter_content(chunk_size=chunk_size):
-                f.write(data)
-                size += len(data)
+        downloader.download(url, path + '/' + name + '.mp4', multipart=True)
 
 def save_user_detail(user, path):
     with open(f'{path}/detail.txt', mode="w", encoding="utf-8") as f:
@@ -366,7 +414,12 @@ def save_note_detail(note, path):
 
 
 @retry(tries=3, delay=1)
-def download_note(note_info, path, save_choice):
+def download_note(note_info, path, save_choice, downloader=None):
+    """
+        保存笔记信息并并发下载笔记的媒体，已下载完成的文件不会重复下载
+        :param downloader: MediaDownloader 或 MediaStore，默认使用全局共享的 MediaStore
+    """
+    downloader = downloader or media_downloader
     note_id = note_info['note_id']
     user_id = note_info['user_id']
     title = note_info['title']
@@ -381,12 +434,14 @@ def download_note(note_info, path, save_choice):
         f.write(json.dumps(note_info) + '\n')
     note_type = note_info['note_type']
     save_note_detail(note_info, save_path)
+    tasks = []
     if note_type == '图集' and save_choice in ['media', 'media-image', 'all']:
         for img_index, img_url in enumerate(note_info['image_list']):
-            download_media(save_path, f'image_{img_index}', img_url, 'image')
+            tasks.append((img_url, f'{save_path}/image_{img_index}.jpg', False))
     elif note_type == '视频' and save_choice in ['media', 'media-video', 'all']:
-        download_media(save_path, 'cover', note_info['video_cover'], 'image')
-        download_media(save_path, 'video', note_info['video_addr'], 'video')
+        tasks.append((note_info['video_cover'], f'{save_path}/cover.jpg', False))
+        tasks.append((note_info['video_addr'], f'{save_path}/video.mp4', True))
+    downloader.download_all(tasks)
     return save_path
 
 
@@ -0,0 +1,239 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, wait
+from loguru import logger
+from xhs_utils.session_util import SessionPool
+
+content_range_re = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+|\*)')
+default_store_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../datas/media_store'))
+
+
+class MediaDownloader():
+    """
+        媒体下载器，所有下载共用一个连接池
+        下载中的文件写入 .part，中断后再次下载时通过 Range 从已下载的位置继续
+        支持 Range 的大文件分成多段并发下载
+        :param max_connections: 全局同时下载的连接数，默认读取环境变量 XHS_DOWNLOAD_WORKERS，未设置为8
+        :param part_size: 分段下载时每段的字节数，小于两段的文件不分段
+        :param chunk_size: 写入文件的块大小
+        :param timeout: 连接和读取超时
+        :param rate_limiter: 按host限速的 RateLimiter，每个请求（包括分段和探测）发出前等待，为None时不限速
+    """
+    def __init__(self, max_connections: int = None, part_size: int = 4 * 1024 * 1024, chunk_size: int = 256 * 1024, timeout: float = 30, rate_limiter=None):
+        if max_connections is None:
+            max_connections = int(os.getenv('XHS_DOWNLOAD_WORKERS') or 8)
+        self.max_connections = max(1, max_connections)
+        self.part_size = part_size
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.session = SessionPool(pool_connections=self.max_connections, pool_maxsize=self.max_connections).new_session()
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        # 文件任务等待分段任务，分段任务不再提交任务，两者分开避免线程池互相等待
+        self._file_executor = ThreadPoolExecutor(self.max_connections)
+        self._part_executor = ThreadPoolExecutor(self.max_connections)
+
+    def _wait(self, url: str):
+        # 在占用连接前等待，限速时不占用连接
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait(url)
+
+    def _fetch(self, url: str, file_path: str, start: int = 0, end: int = None):
+        """
+            下载 [start, end] 字节到 file_path，file_path 已有的内容视为已下载
+            end 为None时下载到文件末尾
+            返回写入后的文件大小
+        """
+        done = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+        if end is not None and start + done > end:
+            return done
+        headers = {}
+        if start + done > 0 or end is not None:
+            headers['Range'] = f'bytes={start + done}-{"" if end is None else end}'
+        self._wait(url)
+        with self._slots:
+            with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as res:
+                if res.status_code == 416 and end is None:
+                    # 已经下载完整
+                    return done
+                res.raise_for_status()
+                if headers and res.status_code != 206:
+                    # 服务器不支持Range，只能从头下载
+                    if start > 0:
+                        raise Exception(f'服务器不支持分段下载 {url}')
+                    done = 0
+                with open(file_path, mode='ab' if done else 'wb') as f:
+                    for data in res.iter_content(chunk_size=self.chunk_size):
+                        f.write(data)
+                        done += len(data)
+        return done
+
+    def _probe(self, url: str):
+        """
+            返回文件大小，服务器不支持Range时返回None
+        """
+        self._wait(url)
+        with self._slots:
+            with self.session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=self.timeout) as res:
+                res.raise_for_status()
+                match = content_range_re.match(res.headers.get('Content-Range', ''))
+                if res.status_code != 206 or match is None or match.group(3) == '*':
+                    return None
+                return int(match.group(3))
+
+    def download(self, url: str, file_path: str, multipart: bool = False):
+        """
+            下载 url 到 file_path，文件已存在时跳过
+            :param multipart: 是否尝试分段并发下载，适合视频等大文件
+            返回 file_path
+        """
+        if os.path.exists(file_path):
+            return file_path
+        part_path = file_path + '.part'
+        size = self._probe(url) if multipart else None
+        if size is None or size < 2 * self.part_size:
+            self._fetch(url, part_path)
+            os.replace(part_path, file_path)
+            return file_path
+
+        ranges = [(start, min(start + self.part_size, size) - 1) for start in range(0, size, self.part_size)]
+        part_paths = [f'{part_path}{index}' for index in range(len(ranges))]
+        futures = [self._part_executor.submit(self._fetch, url, path, start, end) for path, (start, end) in zip(part_paths, ranges)]
+        wait(futures)
+        for future in futures:
+            future.result()
+        for path, (start, end) in zip(part_paths, ranges):
+            if os.path.getsize(path) != end - start + 1:
+                raise Exception(f'分段大小不一致 {path}')
+        with open(part_path, mode='wb') as f:
+            for path in part_paths:
+                with open(path, mode='rb') as part:
+                    shutil.copyfileobj(part, f)
+        os.replace(part_path, file_path)
+        for path in part_paths:
+            os.remove(path)
+        return file_path
+
+    def download_all(self, tasks: list):
+        """
+            并发下载多个文件
+            :param tasks: [(url, file_path, multipart), ...]
+            全部完成后返回，有失败时抛出第一个异常，已完成的文件下次不会重复下载
+        """
+        futures = [self._file_executor.submit(self.download, url, file_path, multipart) for url, file_path, multipart in tasks]
+        wait(futures)
+        errors = []
+        for (url, file_path, multipart), future in zip(tasks, futures):
+            if future.exception() is not None:
+                logger.error(f'下载失败 {url}: {future.exception()}')
+                errors.append(future.exception())
+        if errors:
+            raise errors[0]
+
+    def close(self):
+        self._file_executor.shutdown(wait=False)
+        self._part_executor.shutdown(wait=False)
+        self.session.close()
+
+
+def media_key(url: str):
+    """
+        从小红书cdn的url中提取媒体id，与 XHS_Apis.get_note_no_water_img 的解析方式一致
+        同一张图片不同时间获取的url带有不同的时间戳和签名，但媒体id相同
+        无法识别时返回None
+    """
+    try:
+        urlParse = urllib.parse.urlparse(url)
+        if not urlParse.netloc.endswith('xhscdn.com'):
+            return None
+        path = urlParse.path.split('!')[0]
+        if 'sns-video' in urlParse.netloc:
+            # https://sns-video-bd.xhscdn.com/{origin_video_key}
+            key = path.strip('/')
+        elif '.jpg' in path:
+            key = '/'.join(path.split('/')[-3:])
+        elif 'spectrum' in path:
+            key = '/'.join(path.split('/')[-2:])
+        else:
+            key = path.split('/')[-1]
+    except Exception:
+        return None
+    return key or None
+
+
+def file_hash(file_path: str):
+    sha256 = hashlib.sha256()
+    with open(file_path, mode='rb') as f:
+        for data in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(data)
+    return sha256.hexdigest()
+
+
+class MediaStore(MediaDownloader):
+    """
+        按内容寻址的媒体存储，同一媒体只下载一次，笔记目录中的文件链接到存储中的文件
+        优先以小红书的媒体id为键，重复爬取时不发请求直接链接；无法识别id时下载后以内容的sha256为键去重
+        :param store_path: 存储目录，硬链接要求与笔记目录在同一文件系统
+        :param link: 'hard' 硬链接，'symlink' 软链接，失败时依次退化为软链接、复制
+        其余参数同 MediaDownloader
+    """
+    def __init__(self, max_connections: int = None, store_path: str = default_store_path, link: str = 'hard', **kwargs):
+        super().__init__(max_connections, **kwargs)
+        self.store_path = store_path
+        self.link = link
+        self._key_locks = {}
+        self._key_locks_lock = threading.Lock()
+
+    def blob_path(self, key: str, ext: str):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.store_path, digest[:2], digest + ext)
+
+    def _key_lock(self, key: str):
+        with self._key_locks_lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _link(self, blob: str, file_path: str):
+        if self.link == 'hard':
+            try:
+                os.link(blob, file_path)
+                return
+            except OSError:
+                pass
+        try:
+            os.symlink(os.path.abspath(blob), file_path)
+        except OSError:
+            shutil.copyfile(blob, file_path)
+
+    def download(self, url: str, file_path: str, multipart: bool = False):
+        """
+            同 MediaDownloader.download，存储中已有该媒体时直接链接
+        """
+        if os.path.exists(file_path):
+            return file_path
+        ext = os.path.splitext(file_path)[1]
+        key = media_key(url)
+        if key is not None:
+            blob = self.blob_path('id:' + key, ext)
+            with self._key_lock(blob):
+                if not os.path.exists(blob):
+                    os.makedirs(os.path.dirname(blob), exist_ok=True)
+                    super().download(url, blob, multipart)
+            self._link(blob, file_path)
+            return file_path
+        super().download(url, file_path, multipart)
+        blob = self.blob_path('sha256:' + file_hash(file_path), ext)
+        with self._key_lock(blob):
+            if not os.path.exists(blob):
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                os.replace(file_path, blob)
+            else:
+                os.remove(file_path)
+        self._link(blob, file_path)
+        return file_path
+
+
+media_downloader = MediaStore()
@@ -0,0 +1,217 @@
+import json
+import os
+import queue
+import shutil
+import subprocess
+import threading
+from loguru import logger
+
+static_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../static'))
+server_path = os.path.join(static_path, 'xhs_sign_server.js')
+# 每个签名脚本默认的进程数，两个签名脚本各有一个进程池，需要更多时设置 XHS_SIGN_WORKERS
+default_sign_workers = 2
+
+
+class JsWorkerError(Exception):
+    pass
+
+
+class JsWorker():
+    """
+        常驻的node签名进程，签名脚本只加载一次
+        调用方式与 execjs 的 ctx.call 一致，进程崩溃或超时后自动重启
+        :param script_path: 签名脚本的路径
+        :param timeout: 单次调用的超时时间（秒）
+        :param start_timeout: 启动加载脚本的超时时间（秒）
+    """
+    def __init__(self, script_path: str, timeout: float = 10, start_timeout: float = 60):
+        self.script_path = os.path.abspath(script_path)
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.node = os.getenv('NODE_BIN') or shutil.which('node') or 'node'
+        self._lock = threading.Lock()
+        self._proc = None
+        self._lines = None
+        self._seq = 0
+
+    def _start(self):
+        self._proc = subprocess.Popen(
+            [self.node, server_path, self.script_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            encoding='utf-8',
+            bufsize=1,
+        )
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read_lines, args=(self._proc, self._lines), daemon=True).start()
+        msg = self._read(self.start_timeout)
+        if not msg['ok']:
+            self._stop()
+            raise JsWorkerError(f'签名进程启动失败 {self.script_path}: {msg["error"]}')
+        logger.info(f'签名进程已启动 pid: {self._proc.pid}, script: {os.path.basename(self.script_path)}')
+
+    @staticmethod
+    def _read_lines(proc, lines):
+        for line in proc.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    def _read(self, timeout):
+        try:
+            line = self._lines.get(timeout=timeout)
+        except queue.Empty:
+            raise JsWorkerError(f'签名进程响应超时 {timeout}s')
+        if line is None:
+            raise JsWorkerError('签名进程已退出')
+        return json.loads(line)
+
+    def _stop(self):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+        except Exception:
+            pass
+        try:
+            proc.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    def alive(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self):
+        with self._lock:
+            if not self.alive():
+                self._stop()
+                self._start()
+
+    def _call(self, name, args):
+        if not self.alive():
+            self._stop()
+            self._start()
+        self._seq += 1
+        self._proc.stdin.write(json.dumps({'id': self._seq, 'fn': name, 'args': args}) + '\n')
+        self._proc.stdin.flush()
+        while True:
+            msg = self._read(self.timeout)
+            # 丢弃之前超时请求的迟到响应
+            if msg.get('id') == self._seq:
+                return msg
+
+    def ping(self):
+        return self.call('__ping__') == 'pong'
+
+    def call(self, name, *args):
+        with self._lock:
+            try:
+                msg = self._call(name, list(args))
+            except (OSError, ValueError, JsWorkerError) as e:
+                # 进程崩溃、管道断开或超时，重启后重试一次
+                logger.warning(f'签名进程异常，正在重启: {e}')
+                self._stop()
+                msg = self._call(name, list(args))
+        if not msg['ok']:
+            raise JsWorkerError(msg['error'])
+        return msg['result']
+
+    def close(self):
+        with self._lock:
+            self._stop()
+
+
+class JsWorkerPool():
+    """
+        多个预热的签名进程，调用时分配给空闲的进程（按空闲先后轮询）
+        全部繁忙时调用方阻塞等待，超过 acquire_timeout 抛出异常
+        后台定时对每个进程做健康检查，异常的进程会被重启
+        :param script_path: 签名脚本的路径
+        :param size: 进程数，默认读取环境变量 XHS_SIGN_WORKERS，否则为 default_sign_workers 与cpu核数中较小的一个
+        :param timeout: 单次调用的超时时间（秒）
+        :param acquire_timeout: 等待空闲进程的超时时间（秒）
+        :param health_interval: 健康检查的间隔（秒），为0时不检查
+    """
+    def __init__(self, script_path: str, size: int = None, timeout: float = 10, acquire_timeout: float = 30, health_interval: float = 60):
+        self.size = size or int(os.getenv('XHS_SIGN_WORKERS') or 0) or min(default_sign_workers, os.cpu_count() or 1)
+        self.acquire_timeout = acquire_timeout
+        self.health_interval = health_interval
+        self.workers = [JsWorker(script_path, timeout) for _ in range(self.size)]
+        self._idle = queue.Queue()
+        self._started = False
+        self._start_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._waiting = 0
+        self._waiting_lock = threading.Lock()
+
+    @staticmethod
+    def _warm(worker):
+        try:
+            worker.start()
+        except Exception as e:
+            logger.error(f'签名进程预热失败: {e}')
+
+    def start(self):
+        with self._start_lock:
+            if self._started:
+                return
+            threads = [threading.Thread(target=self._warm, args=(worker,)) for worker in self.workers]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            for worker in self.workers:
+                self._idle.put(worker)
+            self._started = True
+            if self.health_interval:
+                threading.Thread(target=self._health_loop, daemon=True).start()
+
+    def check(self):
+        """
+            对每个进程做一次健康检查，返回健康的进程数
+        """
+        healthy = 0
+        for worker in self.workers:
+            try:
+                if worker.ping():
+                    healthy += 1
+            except Exception as e:
+                logger.error(f'签名进程健康检查失败: {e}')
+        return healthy
+
+    def _health_loop(self):
+        while not self._closed.wait(self.health_interval):
+            self.check()
+
+    def call(self, name, *args):
+        if not self._started:
+            self.start()
+        with self._waiting_lock:
+            self._waiting += 1
+        try:
+            worker = self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise JsWorkerError(f'签名进程全部繁忙，等待超过 {self.acquire_timeout}s')
+        finally:
+            with self._waiting_lock:
+                self._waiting -= 1
+        try:
+            return worker.call(name, *args)
+        finally:
+            self._idle.put(worker)
+
+    def stats(self):
+        idle = self._idle.qsize() if self._started else self.size
+        return {
+            'size': self.size,
+            'busy': self.size - idle,
+            'idle': idle,
+            'waiting': self._waiting,
+            'alive': sum(worker.alive() for worker in self.workers),
+        }
+
+    def close(self):
+        self._closed.set()
+        for worker in self.workers:
+            worker.close()
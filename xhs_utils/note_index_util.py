@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from xhs_utils.download_util import media_key
+
+default_db_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../datas/note_index.db'))
+count_fields = ('liked_count', 'collected_count', 'comment_count', 'share_count')
+
+
+def note_content_hash(note_info: dict):
+    """
+        笔记内容的hash，只包含标题、描述、图片和视频
+        图片url中的时间戳和签名每次获取都不同，按媒体id计算
+    """
+    media = [media_key(url) or url for url in note_info.get('image_list') or []]
+    if note_info.get('video_addr'):
+        media.append(media_key(note_info['video_addr']) or note_info['video_addr'])
+    content = json.dumps([note_info.get('title', ''), note_info.get('desc', ''), media], ensure_ascii=False)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class NoteIndex():
+    """
+        已处理完成的笔记的索引，记录笔记内容的hash和互动数量，重复爬取时跳过没有变化的笔记
+        笔记只在后续处理（下载、提取、入库）全部完成后通过 update 记录，中途失败的笔记下次仍会重新处理
+        :param db_path: sqlite文件路径
+        :param content_ttl: 内容的有效期(秒)，从上次获取笔记时算起
+        :param counts_ttl: 互动数量的有效期(秒)，从上次获取笔记时算起
+        两者都在有效期内才跳过笔记，任一过期就重新请求笔记详情，为0时每次都请求；重新获取后内容没变化的笔记只刷新互动数量，不再做后续处理
+    """
+    def __init__(self, db_path: str = default_db_path, content_ttl: float = 7 * 24 * 3600, counts_ttl: float = 24 * 3600):
+        self.db_path = db_path
+        self.content_ttl = content_ttl
+        self.counts_ttl = counts_ttl
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        if not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS notes ("
+            "note_id TEXT PRIMARY KEY, content_hash TEXT NOT NULL, "
+            "liked_count TEXT, collected_count TEXT, comment_count TEXT, share_count TEXT, "
+            "content_updated_at REAL NOT NULL, counts_updated_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get(self, note_id: str):
+        """
+            返回 {'content_hash', 互动数量..., 'content_updated_at', 'counts_updated_at'}，没有记录返回None
+        """
+        with self._lock:
+            row = self.conn.execute(
+                f"SELECT content_hash, {', '.join(count_fields)}, content_updated_at, counts_updated_at FROM notes WHERE note_id=?",
+                (note_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('content_hash',) + count_fields + ('content_updated_at', 'counts_updated_at'), row))
+
+    def is_fresh(self, note_id: str):
+        """
+            内容和互动数量都仍在有效期内，不需要重新获取
+            每次获取笔记都会更新 counts_updated_at，content_updated_at 只记录内容上次变化的时间，不用于判断有效期
+        """
+        record = self.get(note_id)
+        if record is None:
+            return False
+        elapsed = time.time() - record['counts_updated_at']
+        return elapsed < self.content_ttl and elapsed < self.counts_ttl
+
+    def is_changed(self, note_info: dict):
+        """
+            笔记是否需要后续处理（没有记录或内容有变化），只读取不记录
+        """
+        with self._lock:
+            row = self.conn.execute("SELECT content_hash FROM notes WHERE note_id=?", (note_info['note_id'],)).fetchone()
+        return row is None or row[0] != note_content_hash(note_info)
+
+    def update(self, note_info: dict):
+        """
+            记录处理完成的笔记，返回内容是否有变化（新笔记视为有变化）
+            内容没变化时只刷新互动数量，content_updated_at 只在内容变化时更新
+        """
+        note_id = note_info['note_id']
+        content_hash = note_content_hash(note_info)
+        counts = tuple(str(note_info.get(field)) for field in count_fields)
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT content_hash FROM notes WHERE note_id=?", (note_id,)).fetchone()
+            changed = row is None or row[0] != content_hash
+            if changed:
+                self.conn.execute(
+                    f"INSERT OR REPLACE INTO notes (note_id, content_hash, {', '.join(count_fields)}, content_updated_at, counts_updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (note_id, content_hash) + counts + (now, now)
+                )
+            else:
+                self.conn.execute(
+                    f"UPDATE notes SET {', '.join(f'{field}=?' for field in count_fields)}, counts_updated_at=? WHERE note_id=?",
+                    counts + (now, note_id)
+                )
+            self.conn.commit()
+        return changed
+
+    def remove(self, note_id: str):
+        with self._lock:
+            self.conn.execute("DELETE FROM notes WHERE note_id=?", (note_id,))
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
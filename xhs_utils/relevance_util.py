@@ -0,0 +1,74 @@
+import re
+import threading
+
+# 与具体球场相关的关键词及权重
+default_positive_keywords = {
+    '篮球场': 3, '球场': 2, '篮球': 1, '免费': 1, '全场': 1, '半场': 1, '篮筐': 1, '篮板': 1,
+    '场地': 1, '灯光': 1, '夜场': 1, '塑胶': 1, '硅pu': 1, '木地板': 1, '室外': 1, '室内': 1,
+    '开放': 1, '预约': 1, '停车': 1, '地址': 2, '位置': 1, '公园': 1, '体育馆': 1, '体育中心': 1,
+    '野球': 1, '打球': 1,
+}
+# 与具体球场无关的内容（培训、装备、赛事等）的关键词及权重
+default_negative_keywords = {
+    '培训': -2, '招生': -3, '课程': -2, '教练': -1, '体验课': -3, '球鞋': -2, '球衣': -2, '装备': -1,
+    '转让': -3, '代购': -3, '直播': -2, 'nba': -2, 'cba': -2, '集锦': -2, '比赛回顾': -2, '穿搭': -2,
+}
+# 地址特征，命中一次加分
+default_address_pattern = r'[一-龥]{2,}(?:路|街|大道|巷|号|广场|小区|社区|中学|小学|大学|学院)'
+
+
+class RelevanceFilter():
+    """
+        大模型提取前的本地相关性打分，按关键词和正则对标题、描述、标签打分，低于阈值的笔记不再送给大模型
+        标题中的关键词按 title_weight 倍计分，同一关键词在同一字段只计一次
+        :param threshold: 分数低于阈值的笔记被过滤
+        :param positive_keywords: {关键词: 权重}，默认 default_positive_keywords
+        :param negative_keywords: {关键词: 负权重}，默认 default_negative_keywords
+        :param address_pattern: 地址特征的正则，命中时加 address_weight 分
+    """
+    def __init__(self, threshold: float = 2, positive_keywords: dict = None, negative_keywords: dict = None,
+                 address_pattern: str = default_address_pattern, address_weight: float = 2, title_weight: float = 2):
+        self.threshold = threshold
+        self.keywords = dict(default_positive_keywords if positive_keywords is None else positive_keywords)
+        self.keywords.update(default_negative_keywords if negative_keywords is None else negative_keywords)
+        self.address_re = re.compile(address_pattern) if address_pattern else None
+        self.address_weight = address_weight
+        self.title_weight = title_weight
+        self._lock = threading.Lock()
+        self.passed = 0
+        self.dropped = 0
+
+    def _score_text(self, text: str):
+        text = text.lower()
+        score = sum(weight for keyword, weight in self.keywords.items() if keyword in text)
+        if self.address_re is not None and self.address_re.search(text):
+            score += self.address_weight
+        return score
+
+    def score(self, note: dict):
+        """
+            返回笔记的相关性分数
+        """
+        title = note.get('title') or ''
+        body = ' '.join([note.get('desc') or ''] + list(note.get('tags') or []))
+        return self._score_text(title) * self.title_weight + self._score_text(body)
+
+    def split(self, notes: list):
+        """
+            返回 (相关的笔记, 被过滤的笔记)，并累计到统计中
+        """
+        passed, dropped = [], []
+        for note in notes:
+            (passed if self.score(note) >= self.threshold else dropped).append(note)
+        with self._lock:
+            self.passed += len(passed)
+            self.dropped += len(dropped)
+        return passed, dropped
+
+    def stats(self):
+        """
+            pass_rate: 送给大模型的笔记比例
+        """
+        with self._lock:
+            total = self.passed + self.dropped
+            return {'passed': self.passed, 'dropped': self.dropped, 'pass_rate': self.passed / total if total else 0}
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class SessionPool():
+    """
+        按 cookies + 代理 区分的 requests.Session 池，同一身份的请求复用连接
+        :param pool_connections: 每个session缓存的host连接池数量
+        :param pool_maxsize: 每个host连接池的最大连接数
+        :param retries: 5xx/429 的重试次数
+        :param backoff_factor: 重试的退避系数，第n次重试等待 backoff_factor * 2^(n-1) 秒
+    """
+    status_forcelist = (429, 500, 502, 503, 504)
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 20, retries: int = 3, backoff_factor: float = 0.5):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._sessions = {}
+        self._requests = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def identity(cookies_str: str = None, proxies: dict = None):
+        cookies_hash = hashlib.md5((cookies_str or '').encode('utf-8')).hexdigest()[:16]
+        return cookies_hash, json.dumps(proxies or {}, sort_keys=True)
+
+    def new_session(self):
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=self.status_forcelist,
+            # 小红书的POST接口都是查询类接口，可以安全重试
+            allowed_methods=None,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def get(self, cookies_str: str = None, proxies: dict = None):
+        """
+            获取该身份对应的session，不存在则创建
+        """
+        key = self.identity(cookies_str, proxies)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self.new_session()
+                if proxies:
+                    session.proxies.update(proxies)
+                self._sessions[key] = session
+                self._requests[key] = 0
+            self._requests[key] += 1
+        return session
+
+    def stats(self):
+        """
+            返回每个session的连接池统计
+            requests: 获取该session的次数
+            num_connections: 新建的连接数，远小于 num_requests 说明连接被复用
+        """
+        with self._lock:
+            items = list(self._sessions.items())
+            counts = dict(self._requests)
+        result = []
+        for key, session in items:
+            pools = []
+            adapter = session.get_adapter('https://')
+            managers = [adapter.poolmanager] + list(adapter.proxy_manager.values())
+            for manager in managers:
+                for pool_key in list(manager.pools.keys()):
+                    pool = manager.pools.get(pool_key)
+                    if pool is None:
+                        continue
+                    pools.append({
+                        'host': pool.host,
+                        'num_connections': pool.num_connections,
+                        'num_requests': pool.num_requests,
+                        # 队列中未建立的连接以None占位
+                        'idle_connections': sum(conn is not None for conn in list(pool.pool.queue)) if pool.pool else 0,
+                    })
+            result.append({
+                'cookies': key[0],
+                'proxies': key[1],
+                'requests': counts.get(key, 0),
+                'pools': pools,
+            })
+        return result
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            self._requests.clear()
+        for session in sessions:
+            session.close()
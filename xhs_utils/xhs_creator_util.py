@@ -1,11 +1,9 @@
 import json
+import os
 
-import execjs
+from xhs_utils.js_worker import JsWorkerPool, static_path
 
-try:
-    js = execjs.compile(open(r'../static/xhs_creator_xs.js', 'r', encoding='utf-8').read())
-except:
-    js = execjs.compile(open(r'static/xhs_creator_xs.js', 'r', encoding='utf-8').read())
+js = JsWorkerPool(os.path.join(static_path, 'xhs_creator_xs.js'))
 
 
 def generate_xs(a1, api, data=''):
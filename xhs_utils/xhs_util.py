@@ -1,18 +1,21 @@
 import json
 import math
 import random
-import execjs
+import os
+import threading
+import time
+from loguru import logger
 from xhs_utils.cookie_util import trans_cookies
+from xhs_utils.js_worker import JsWorker, JsWorkerPool, static_path
 
-try:
-    js = execjs.compile(open(r'../static/xhs_xs_xsc_56.js', 'r', encoding='utf-8').read())
-except:
-    js = execjs.compile(open(r'static/xhs_xs_xsc_56.js', 'r', encoding='utf-8').read())
+js = JsWorkerPool(os.path.join(static_path, 'xhs_xs_xsc_56.js'))
+# 仅在python实现出错时才会启动
+xray_js = JsWorker(os.path.join(static_path, 'xhs_xray.js'))
 
-try:
-    xray_js = execjs.compile(open(r'../static/xhs_xray.js', 'r', encoding='utf-8').read())
-except:
-    xray_js = execjs.compile(open(r'static/xhs_xray.js', 'r', encoding='utf-8').read())
+# 与 xhs_xray.js 中 Int.SEQ / Int.MAX_SEQ 一致，进程内自增
+XRAY_MAX_SEQ = 2 ** 23 - 1
+xray_seq = math.floor(random.random() * 2 ** 23)
+xray_seq_lock = threading.Lock()
 
 def generate_x_b3_traceid(len=16):
     x_b3_traceid = ""
@@ -30,8 +33,34 @@ def generate_xs(a1, api, data=''):
     xs, xt = ret['X-s'], ret['X-t']
     return xs, xt
 
+def next_xray_seq():
+    global xray_seq
+    with xray_seq_lock:
+        if xray_seq > XRAY_MAX_SEQ:
+            xray_seq = 0
+        seq = xray_seq
+        xray_seq += 1
+    return seq
+
+def generate_xray_traceid_py(timestamp=None, rand=random.random):
+    """
+        xhs_xray.js 中 traceId 的python实现
+        前16位: (毫秒时间戳 << 23 | 自增序号) 的64位无符号十六进制
+        后16位: 两个32位随机数（先低位后高位）拼成的64位十六进制
+    """
+    if timestamp is None:
+        timestamp = int(time.time() * 1000)
+    head = ((timestamp << 23) | next_xray_seq()) & 0xFFFFFFFFFFFFFFFF
+    low = math.floor(rand() * 2 ** 32)
+    high = math.floor(rand() * 2 ** 32)
+    return f'{head:016x}{(high << 32) | low:016x}'
+
 def generate_xray_traceid():
-    return xray_js.call('traceId')
+    try:
+        return generate_xray_traceid_py()
+    except Exception as e:
+        logger.warning(f'x-xray-traceid 生成失败，使用js生成: {e}')
+        return xray_js.call('traceId')
 def get_common_headers():
     return {
         "authority": "www.xiaohongshu.com",